@@ -1,13 +1,60 @@
+import asyncio
+import io
 import openai
 import os
 import json
 import re
+from functools import lru_cache
+
+# Leading note name stripped from a melody token to leave only its duration
+_RE_DUR_STRIP = re.compile(r'^[CFGDAEB][#b]?')
+
+# Duration suffix -> beats in 4/4 ('/2' and '/4' are the dotted variants)
+_DURATION_TABLE = {
+    '': 1.0,      # No duration specified (default quarter note)
+    '2': 2.0,     # Half note
+    '4': 1.0,     # Quarter note
+    '8': 0.5,     # Eighth note
+    '16': 0.25,   # Sixteenth note
+    '/2': 3.0,    # Dotted half note
+    '/4': 1.5,    # Dotted quarter note
+}
+
+# Deletes chord root letters; a line changes under it iff it contains one
+_CHORD_PRESENCE_TRANS = str.maketrans('', '', 'CFGDAEB')
+
+# Simple fallback ABC notation spanning 16 bars with placeholder lyrics
+_FALLBACK_ABC_TEMPLATE = """X:1
+T:{song_name}
+M:4/4
+L:1/4
+K:C
+"C"C D E F | "F"G A B c | "G"d e f g | "C"a g f e |
+w: La la la la | La la la la | La la la la | La la la la |
+"C"C D E F | "F"G A B c | "G"d e f g | "C"a4 |
+w: La la la la | La la la la | La la la la | La la laaa |
+"C"C D E F | "F"G A B c | "G"d e f g | "C"a g f e |
+w: La la la la | La la la la | La la la la | La la la la |
+"C"C D E F | "F"G A B c | "G"d e f g | "C"c4 |
+w: La la la la | La la la la | La la la la | La la laaa |"""
+
+
+@lru_cache(maxsize=128)
+def _render_fallback_abc(song_name: str) -> str:
+    return _FALLBACK_ABC_TEMPLATE.format(song_name=song_name)
+
 
 class ReconciliationService:
+    # Cap on in-flight GPT-4 requests when reconciling songs in batch
+    MAX_CONCURRENT_RECONCILIATIONS = 20
+
     def __init__(self):
+        # Kept for reconcile_many, which builds its own short-lived async client
+        self.api_key = None
         try:
             # Initialize OpenAI client with minimal parameters
             api_key = os.getenv('OPENAI_API_KEY')
+            self.api_key = api_key
             if not api_key:
                 print("OpenAI API key not found")
                 self.client = None
@@ -54,37 +101,89 @@ class ReconciliationService:
             print("OpenAI client not available, using smart fallback ABC notation")
             return self._get_smart_fallback_abc(song_name, tabs)
         
-        # Extract approximately the first 16 bars from each tab
-        snippets = [self._extract_16_bars(tab['content']) for tab in tabs]
-        
-        # Create reconciliation prompt
-        prompt = self._create_reconciliation_prompt(snippets, song_name, tabs)
+        messages = self._build_messages(tabs, song_name)
         
         try:
             # Get GPT-4 to reconcile
             response = self.client.chat.completions.create(
                 model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a music transcription expert specializing in converting guitar tabs to ABC notation. You excel at reconciling different versions of the same song into a single, accurate representation."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=messages,
                 temperature=0.2
             )
-            
-            # Parse ABC notation and confidence
-            result_text = response.choices[0].message.content
-            abc, confidence = self._parse_result(result_text)
-            
-            return {
-                'abc_notation': abc,
-                'confidence': confidence,
-                'song_name': song_name,
-                'key': self._extract_key_from_abc(abc)
-            }
+            return self._build_result(response.choices[0].message.content, song_name)
+        except Exception as e:
+            print(f"OpenAI API call failed: {str(e)}")
+            return self._get_smart_fallback_abc(song_name, tabs)
+    
+    async def reconcile_tabs_async(self, async_client, tabs: list, song_name: str, semaphore: asyncio.Semaphore):
+        """Async variant of reconcile_tabs so several songs can share one event loop"""
+        
+        if async_client is None:
+            print("OpenAI client not available, using smart fallback ABC notation")
+            return self._get_smart_fallback_abc(song_name, tabs)
+        
+        messages = self._build_messages(tabs, song_name)
+        
+        try:
+            async with semaphore:
+                response = await async_client.chat.completions.create(
+                    model="gpt-4",
+                    messages=messages,
+                    temperature=0.2
+                )
+            return self._build_result(response.choices[0].message.content, song_name)
         except Exception as e:
             print(f"OpenAI API call failed: {str(e)}")
             return self._get_smart_fallback_abc(song_name, tabs)
     
+    async def reconcile_many(self, jobs: list):
+        """Reconcile many (tabs, song_name) jobs concurrently.
+        
+        Results are returned in job order; a job that raises yields its exception.
+        The async client lives only for this call, so its connection pool never
+        outlives the event loop it was opened on.
+        """
+        async_client = None
+        if self.api_key:
+            try:
+                async_client = openai.AsyncOpenAI(api_key=self.api_key, timeout=30.0)
+            except Exception as e:
+                print(f"Async OpenAI client initialization failed: {str(e)}")
+        
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_RECONCILIATIONS)
+        try:
+            return await asyncio.gather(
+                *(self.reconcile_tabs_async(async_client, tabs, song_name, semaphore) for tabs, song_name in jobs),
+                return_exceptions=True
+            )
+        finally:
+            if async_client is not None:
+                await async_client.close()
+    
+    def _build_messages(self, tabs: list, song_name: str):
+        """Build the chat messages for a reconciliation request"""
+        # Extract approximately the first 16 bars from each tab
+        snippets = [self._extract_16_bars(tab['content']) for tab in tabs]
+        
+        # Create reconciliation prompt
+        prompt = self._create_reconciliation_prompt(snippets, song_name, tabs)
+        
+        return [
+            {"role": "system", "content": "You are a music transcription expert specializing in converting guitar tabs to ABC notation. You excel at reconciling different versions of the same song into a single, accurate representation."},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _build_result(self, result_text: str, song_name: str):
+        """Parse ABC notation and confidence out of the model response"""
+        abc, confidence = self._parse_result(result_text)
+        
+        return {
+            'abc_notation': abc,
+            'confidence': confidence,
+            'song_name': song_name,
+            'key': self._extract_key_from_abc(abc)
+        }
+    
     def _extract_16_bars(self, tab_content: str):
         """Extract approximately first 16 bars from tab content"""
         if not tab_content:
@@ -176,12 +275,17 @@ Output format (JSON):
             # Return a basic ABC notation as fallback
             return f"X:1\nT:Song\nM:4/4\nL:1/4\nK:C\nC D E F |", 0.3
     
-    def _extract_key_from_abc(self, abc_notation: str):
+    def _extract_key_from_abc(self, abc_notation: str) -> str:
         """Extract key signature from ABC notation"""
-        for line in abc_notation.split('\n'):
-            if line.startswith('K:'):
-                return line.split(':')[1].strip()
-        return 'C'
+        if abc_notation.startswith('K:'):
+            start = 2
+        else:
+            i = abc_notation.find('\nK:')
+            if i < 0:
+                return 'C'
+            start = i + 3
+        end = abc_notation.find('\n', start)
+        return abc_notation[start:end if end >= 0 else None].strip() or 'C'
     
     def _get_smart_fallback_abc(self, song_name: str, tabs: list):
         """Get smart fallback ABC notation using actual mock data content"""
@@ -219,6 +323,7 @@ Output format (JSON):
             in_melody_section = False
             for line in lines:
                 line = line.strip()
+                line_upper = line.upper()
                 if not line or line.startswith('Chords:'):
                     continue
                 
@@ -231,30 +336,30 @@ Output format (JSON):
                     continue
                 
                 # Extract melody notes if in melody section
-                if in_melody_section and re.match(r'^[CFGDAEB][\s]+[CFGDAEB]', line.upper()):
+                if in_melody_section and re.match(r'^[CFGDAEB][\s]+[CFGDAEB]', line_upper):
                     # This is a melody line with note sequences (including durations)
-                    melody_line = re.findall(r'\b([CFGDAEB][#b]?\d*)\b', line.upper())
+                    melody_line = re.findall(r'\b([CFGDAEB][#b]?\d*)\b', line_upper)
                     if melody_line:
                         melody_notes.extend(melody_line)
                         print(f"Found melody: {line} -> {melody_line}")
                     continue
                 
                 # Look for chord patterns (lines with just chords)
-                if re.match(r'^[CFGDAEB][#b]?m?7?\s*$', line.upper()):
-                    chords.append(line.upper())
+                if re.match(r'^[CFGDAEB][#b]?m?7?\s*$', line_upper):
+                    chords.append(line_upper)
                     print(f"Found chord: {line}")
                 # Look for lines with chords and lyrics
-                elif any(chord in line.upper() for chord in ['C', 'F', 'G', 'D', 'A', 'E', 'B']):
+                elif line_upper.translate(_CHORD_PRESENCE_TRANS) != line_upper:
                     # Extract chords from line
-                    chord_matches = re.findall(r'\b([CFGDAEB][#b]?m?7?)\b', line.upper())
+                    chord_matches = re.findall(r'\b([CFGDAEB][#b]?m?7?)\b', line_upper)
                     if chord_matches:
                         chords.extend(chord_matches)
                         print(f"Found chords in line: {line} -> {chord_matches}")
                 
                 # Check if this line contains melody notes (with or without durations)
-                if re.match(r'^[CFGDAEB][\s]+[CFGDAEB]', line.upper()):
+                if re.match(r'^[CFGDAEB][\s]+[CFGDAEB]', line_upper):
                     # This is a melody line with note sequences
-                    melody_line = re.findall(r'\b([CFGDAEB][#b]?\d*)\b', line.upper())
+                    melody_line = re.findall(r'\b([CFGDAEB][#b]?\d*)\b', line_upper)
                     if melody_line:
                         melody_notes.extend(melody_line)
                         print(f"Found melody notes: {line} -> {melody_line}")
@@ -263,12 +368,12 @@ Output format (JSON):
                 # Look for lyric patterns (lines with actual words, not just chords or melody notes)
                 # A line is lyrics if it has words and is not just chord symbols or melody notes
                 if (len(line) > 5 and 
-                    not re.match(r'^[CFGDAEB\s#b]+$', line.upper()) and 
+                    not re.match(r'^[CFGDAEB\s#b]+$', line_upper) and 
                     any(char.isalpha() for char in line) and
                     # Check if it's not just chord symbols with spaces
-                    not re.match(r'^[CFGDAEB][\s]+[CFGDAEB]', line.upper()) and
+                    not re.match(r'^[CFGDAEB][\s]+[CFGDAEB]', line_upper) and
                     # Check if it's not melody notes with durations (like C2 C2 G2 G2)
-                    not re.match(r'^[CFGDAEB]\d+[\s]+[CFGDAEB]\d+', line.upper())):
+                    not re.match(r'^[CFGDAEB]\d+[\s]+[CFGDAEB]\d+', line_upper)):
                     # This is likely lyrics
                     lyrics.append(line)
                     print(f"Found lyrics: {line}")
@@ -281,115 +386,121 @@ Output format (JSON):
             if melody_notes:
                 self._validate_note_durations(melody_notes)
             
-            # Create basic ABC notation with real lyrics and melody
-            abc_lines = [
-                f"X:1",
-                f"T:{song_name}",
-                "M:4/4",
-                "L:1/4",
-                "K:C"
-            ]
+            # Stream the ABC lines into a single buffer
+            buf = io.StringIO()
+            for idx, abc_line in enumerate(self._emit_abc(song_name, chords, lyrics, melody_notes)):
+                if idx:
+                    buf.write('\n')
+                buf.write(abc_line)
+            return buf.getvalue()
+        
+        except Exception as e:
+            print(f"Error converting tab to ABC: {str(e)}")
+        
+        return None
+    
+    def _emit_abc(self, song_name: str, chords: list, lyrics: list, melody_notes: list):
+        """Yield the ABC notation lines for the extracted chords, lyrics, and melody"""
+        # Create basic ABC notation with real lyrics and melody
+        yield "X:1"
+        yield f"T:{song_name}"
+        yield "M:4/4"
+        yield "L:1/4"
+        yield "K:C"
+        
+        # Use actual melody if available, otherwise fallback to generic
+        if melody_notes:
+            print(f"Using actual melody: {melody_notes}")
+            
+            # Create complete lyrics for the entire song
+            complete_lyrics = []
+            if lyrics:
+                # Use all available lyrics
+                complete_lyrics = lyrics
+                # If we have fewer than 4 lines, repeat the last line
+                while len(complete_lyrics) < 4:
+                    complete_lyrics.append(complete_lyrics[-1] if complete_lyrics else "La la la la")
+            else:
+                complete_lyrics = ["La la la la"] * 4
             
-            # Use actual melody if available, otherwise fallback to generic
-            if melody_notes:
-                print(f"Using actual melody: {melody_notes}")
+            # Create 4 lines of 4 bars each (16 total bars)
+            for line_idx in range(4):
+                chord = chords[line_idx % len(chords)] if chords else "C"
                 
-                # Create complete lyrics for the entire song
-                complete_lyrics = []
-                if lyrics:
-                    # Use all available lyrics
-                    complete_lyrics = lyrics
-                    # If we have fewer than 4 lines, repeat the last line
-                    while len(complete_lyrics) < 4:
-                        complete_lyrics.append(complete_lyrics[-1] if complete_lyrics else "La la la la")
+                # Use actual melody notes for this line
+                if melody_notes:
+                    # Take 16 notes from the melody, cycling if needed
+                    line_melody = (melody_notes * 4)[:16]  # Repeat melody to get 16 notes
+                    # Group into 4 bars of 4 notes each
+                    bars = []
+                    for bar_idx in range(4):
+                        bar_notes = line_melody[bar_idx*4:(bar_idx+1)*4]
+                        # Ensure notes have proper duration (default to quarter notes if no duration specified)
+                        formatted_notes = []
+                        for note in bar_notes:
+                            if note.isdigit() or note.endswith(('2', '4', '8')):
+                                # Note already has duration
+                                formatted_notes.append(note)
+                            else:
+                                # Add default quarter note duration
+                                formatted_notes.append(note)
+                        bar_str = ' '.join(formatted_notes)
+                        bars.append(bar_str)
+                    melody_line = ' | '.join(bars) + ' |'
+                    yield f'"{chord}"{melody_line}'
                 else:
-                    complete_lyrics = ["La la la la"] * 4
+                    # Fallback to generic melody
+                    yield f'"{chord}"C D E F | "F"G A B c | "G"d e f g | "C"a4 |'
                 
-                # Create 4 lines of 4 bars each (16 total bars)
-                for line_idx in range(4):
-                    chord = chords[line_idx % len(chords)] if chords else "C"
-                    
-                    # Use actual melody notes for this line
-                    if melody_notes:
-                        # Take 16 notes from the melody, cycling if needed
-                        line_melody = (melody_notes * 4)[:16]  # Repeat melody to get 16 notes
-                        # Group into 4 bars of 4 notes each
-                        bars = []
-                        for bar_idx in range(4):
-                            bar_notes = line_melody[bar_idx*4:(bar_idx+1)*4]
-                            # Ensure notes have proper duration (default to quarter notes if no duration specified)
-                            formatted_notes = []
-                            for note in bar_notes:
-                                if note.isdigit() or note.endswith(('2', '4', '8')):
-                                    # Note already has duration
-                                    formatted_notes.append(note)
-                                else:
-                                    # Add default quarter note duration
-                                    formatted_notes.append(note)
-                            bar_str = ' '.join(formatted_notes)
-                            bars.append(bar_str)
-                        melody_line = ' | '.join(bars) + ' |'
-                        abc_lines.append(f'"{chord}"{melody_line}')
-                    else:
-                        # Fallback to generic melody
-                        abc_lines.append(f'"{chord}"C D E F | "F"G A B c | "G"d e f g | "C"a4 |')
-                    
-                    # Add complete lyrics for this line
-                    lyric_line = complete_lyrics[line_idx] if line_idx < len(complete_lyrics) else "La la la la"
-                    words = lyric_line.split()
-                    
-                    # Create lyrics for all 4 bars of this line
-                    if len(words) >= 4:
-                        # Split words into 4 bars
-                        bar_words = [words[i:i+4] for i in range(0, len(words), 4)][:4]
-                        lyric_bars = []
-                        for bar in bar_words:
-                            if len(bar) == 4:
-                                lyric_bars.append(' '.join(bar))
-                            else:
-                                # Pad with "la" if not enough words
-                                padded_bar = bar + ['la'] * (4 - len(bar))
-                                lyric_bars.append(' '.join(padded_bar))
-                        abc_lines.append(f"w: {' | '.join(lyric_bars)} |")
-                    else:
-                        # If not enough words, repeat the line across bars
-                        repeated_words = (words * 4)[:16]  # Repeat to get 16 words
-                        bar_words = [repeated_words[i:i+4] for i in range(0, 16, 4)]
-                        lyric_bars = [' '.join(bar) for bar in bar_words]
-                        abc_lines.append(f"w: {' | '.join(lyric_bars)} |")
-            else:
-                # Fallback to generic melody and lyrics
-                print("No melody found, using generic C major scale")
-                lyric_lines = lyrics[:4] if len(lyrics) >= 4 else lyrics + ["La la la la"] * (4 - len(lyrics))
+                # Add complete lyrics for this line
+                lyric_line = complete_lyrics[line_idx] if line_idx < len(complete_lyrics) else "La la la la"
+                words = lyric_line.split()
                 
-                for i, lyric_line in enumerate(lyric_lines):
-                    chord = chords[i % len(chords)] if chords else "C"
-                    abc_lines.append(f'"{chord}"C D E F | "F"G A B c | "G"d e f g | "C"a4 |')
-                    
-                    # Split lyric line into words for the 4 bars
-                    words = lyric_line.split()
-                    if len(words) >= 4:
-                        bar_words = [words[i:i+4] for i in range(0, len(words), 4)][:4]
-                        lyric_bars = []
-                        for bar in bar_words:
-                            if len(bar) == 4:
-                                lyric_bars.append(' '.join(bar))
-                            else:
-                                lyric_bars.append(' '.join(bar) + ' ' + ' '.join(['la'] * (4 - len(bar))))
-                        abc_lines.append(f"w: {' | '.join(lyric_bars)} |")
-                    else:
-                        # Pad with "la" if not enough words
-                        padded_words = words + ['la'] * (16 - len(words))
-                        bar_words = [padded_words[i:i+4] for i in range(0, 16, 4)]
-                        lyric_bars = [' '.join(bar) for bar in bar_words]
-                        abc_lines.append(f"w: {' | '.join(lyric_bars)} |")
+                # Create lyrics for all 4 bars of this line
+                if len(words) >= 4:
+                    # Split words into 4 bars
+                    bar_words = [words[i:i+4] for i in range(0, len(words), 4)][:4]
+                    lyric_bars = []
+                    for bar in bar_words:
+                        if len(bar) == 4:
+                            lyric_bars.append(' '.join(bar))
+                        else:
+                            # Pad with "la" if not enough words
+                            padded_bar = bar + ['la'] * (4 - len(bar))
+                            lyric_bars.append(' '.join(padded_bar))
+                    yield f"w: {' | '.join(lyric_bars)} |"
+                else:
+                    # If not enough words, repeat the line across bars
+                    repeated_words = (words * 4)[:16]  # Repeat to get 16 words
+                    bar_words = [repeated_words[i:i+4] for i in range(0, 16, 4)]
+                    lyric_bars = [' '.join(bar) for bar in bar_words]
+                    yield f"w: {' | '.join(lyric_bars)} |"
+        else:
+            # Fallback to generic melody and lyrics
+            print("No melody found, using generic C major scale")
+            lyric_lines = lyrics[:4] if len(lyrics) >= 4 else lyrics + ["La la la la"] * (4 - len(lyrics))
             
-            return '\n'.join(abc_lines)
-        
-        except Exception as e:
-            print(f"Error converting tab to ABC: {str(e)}")
-        
-        return None
+            for i, lyric_line in enumerate(lyric_lines):
+                chord = chords[i % len(chords)] if chords else "C"
+                yield f'"{chord}"C D E F | "F"G A B c | "G"d e f g | "C"a4 |'
+                
+                # Split lyric line into words for the 4 bars
+                words = lyric_line.split()
+                if len(words) >= 4:
+                    bar_words = [words[i:i+4] for i in range(0, len(words), 4)][:4]
+                    lyric_bars = []
+                    for bar in bar_words:
+                        if len(bar) == 4:
+                            lyric_bars.append(' '.join(bar))
+                        else:
+                            lyric_bars.append(' '.join(bar) + ' ' + ' '.join(['la'] * (4 - len(bar))))
+                    yield f"w: {' | '.join(lyric_bars)} |"
+                else:
+                    # Pad with "la" if not enough words
+                    padded_words = words + ['la'] * (16 - len(words))
+                    bar_words = [padded_words[i:i+4] for i in range(0, 16, 4)]
+                    lyric_bars = [' '.join(bar) for bar in bar_words]
+                    yield f"w: {' | '.join(lyric_bars)} |"
     
     def _validate_note_durations(self, melody_notes: list):
         """Validate that note durations add up to 4 beats per bar (4/4 time signature)"""
@@ -425,34 +536,26 @@ Output format (JSON):
         except Exception as e:
             print(f"Error validating note durations: {str(e)}")
     
-    def _get_note_duration_beats(self, note: str) -> float:
+    @staticmethod
+    def _get_note_duration_beats(note: str) -> float:
         """Convert ABC note to beat count"""
         # Remove note name, keep only duration
-        duration = re.sub(r'^[CFGDAEB][#b]?', '', note.upper())
+        duration = _RE_DUR_STRIP.sub('', note.upper())
         
-        if not duration:  # No duration specified (default quarter note)
-            return 1.0
-        elif duration == '2':  # Half note
-            return 2.0
-        elif duration == '4':  # Quarter note
-            return 1.0
-        elif duration == '8':  # Eighth note
-            return 0.5
-        elif duration == '16':  # Sixteenth note
-            return 0.25
-        elif '/' in duration:  # Dotted notes
-            base_duration = duration.split('/')[0]
-            if base_duration == '2':
-                return 3.0  # Dotted half note
-            elif base_duration == '4':
-                return 1.5  # Dotted quarter note
-        else:
-            # Try to parse as number
-            try:
-                num = float(duration)
-                return 4.0 / num  # 4/4 time signature
-            except:
-                return 1.0  # Default to quarter note
+        beats = _DURATION_TABLE.get(duration)
+        if beats is not None:
+            return beats
+        
+        if '/' in duration:  # Dotted notes
+            beats = _DURATION_TABLE.get('/' + duration.split('/')[0])
+            if beats is not None:
+                return beats
+        
+        # Try to parse as number
+        try:
+            return 4.0 / float(duration)  # 4/4 time signature
+        except (ValueError, ZeroDivisionError):
+            return 1.0  # Default to quarter note
     
     def _suggest_bar_corrections(self, bar: list, current_beats: float):
         """Suggest corrections for bars that don't add up to 4 beats"""
@@ -476,23 +579,8 @@ Output format (JSON):
     
     def _get_fallback_abc(self, song_name: str):
         """Get fallback ABC notation when OpenAI is not available"""
-        # Simple fallback ABC notation spanning 16 bars with placeholder lyrics
-        fallback_abc = f"""X:1
-T:{song_name}
-M:4/4
-L:1/4
-K:C
-"C"C D E F | "F"G A B c | "G"d e f g | "C"a g f e |
-w: La la la la | La la la la | La la la la | La la la la |
-"C"C D E F | "F"G A B c | "G"d e f g | "C"a4 |
-w: La la la la | La la la la | La la la la | La la laaa |
-"C"C D E F | "F"G A B c | "G"d e f g | "C"a g f e |
-w: La la la la | La la la la | La la la la | La la la la |
-"C"C D E F | "F"G A B c | "G"d e f g | "C"c4 |
-w: La la la la | La la la la | La la la la | La la laaa |"""
-        
         return {
-            'abc_notation': fallback_abc,
+            'abc_notation': _render_fallback_abc(song_name),
             'confidence': 0.3,
             'song_name': song_name,
             'key': 'C'
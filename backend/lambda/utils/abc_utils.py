@@ -1,5 +1,18 @@
 import re
 
+# Match patterns like 4/4, 3/4, 6/8, C, C|
+_TIME_RE = re.compile(r'M:\s*(\d+/\d+|C\|?)')
+_NOTE_RE = re.compile(r'[A-Ga-g]')
+# First token of the key field, e.g. 'Am' in 'K: Am dorian'
+_KEY_RE = re.compile(r'K:\s*([^\s:]+)')
+
+VALID_KEYS = frozenset({
+    'C', 'G', 'D', 'A', 'E', 'B', 'F#', 'C#',
+    'F', 'Bb', 'Eb', 'Ab', 'Db', 'Gb', 'Cb',
+    'Am', 'Em', 'Bm', 'F#m', 'C#m', 'G#m', 'D#m',
+    'Dm', 'Gm', 'Cm', 'Fm', 'Bbm', 'Ebm'
+})
+
 class ABCValidator:
     REQUIRED_HEADERS = ['X:', 'T:', 'M:', 'L:', 'K:']
     
@@ -13,20 +26,27 @@ class ABCValidator:
             if header not in abc_notation:
                 errors.append(f"Missing required header: {header}")
         
+        # Index header lines by field (first occurrence wins) in one pass
+        lines = abc_notation.split('\n')
+        header_map = {}
+        for line in lines:
+            if line[1:2] == ':':
+                header_map.setdefault(line[:2], line)
+        
         # Check for valid key signature
-        if 'K:' in abc_notation:
-            key_line = [line for line in abc_notation.split('\n') if line.startswith('K:')][0]
+        key_line = header_map.get('K:')
+        if key_line is not None:
             if not self._validate_key(key_line):
                 errors.append(f"Invalid key signature: {key_line}")
         
         # Check for valid time signature
-        if 'M:' in abc_notation:
-            time_line = [line for line in abc_notation.split('\n') if line.startswith('M:')][0]
+        time_line = header_map.get('M:')
+        if time_line is not None:
             if not self._validate_time(time_line):
                 errors.append(f"Invalid time signature: {time_line}")
         
         # Check for basic ABC syntax
-        if not self._has_music_content(abc_notation):
+        if not self._has_music_content(lines):
             warnings.append("No music content found")
         
         return {
@@ -37,34 +57,21 @@ class ABCValidator:
     
     def _validate_key(self, key_line: str) -> bool:
         """Validate key signature"""
-        valid_keys = [
-            'C', 'G', 'D', 'A', 'E', 'B', 'F#', 'C#', 
-            'F', 'Bb', 'Eb', 'Ab', 'Db', 'Gb', 'Cb',
-            'Am', 'Em', 'Bm', 'F#m', 'C#m', 'G#m', 'D#m', 'Bbm',
-            'Dm', 'Gm', 'Cm', 'Fm', 'Bbm', 'Ebm'
-        ]
-        
-        try:
-            key = key_line.split(':')[1].strip().split()[0]
-            return key in valid_keys
-        except:
-            return False
+        match = _KEY_RE.match(key_line)
+        return match is not None and match.group(1) in VALID_KEYS
     
     def _validate_time(self, time_line: str) -> bool:
         """Validate time signature"""
-        # Match patterns like 4/4, 3/4, 6/8, C, C|
-        pattern = r'M:\s*(\d+/\d+|C\|?)'
-        return bool(re.match(pattern, time_line))
+        return bool(_TIME_RE.match(time_line))
     
-    def _has_music_content(self, abc_notation: str) -> bool:
-        """Check if ABC notation has music content"""
+    def _has_music_content(self, lines: list) -> bool:
+        """Check if the ABC notation lines have music content"""
         # Look for music lines (not headers)
-        lines = abc_notation.split('\n')
         for line in lines:
             line = line.strip()
             if line and not line.startswith(('X:', 'T:', 'M:', 'L:', 'K:')):
                 # Check if line contains notes or chords
-                if re.search(r'[A-Ga-g]', line) or '"' in line:
+                if _NOTE_RE.search(line) or '"' in line:
                     return True
         return False
     
@@ -1,7 +1,11 @@
 import io
 import base64
+import binascii
+from functools import lru_cache
 from typing import List, Tuple, Optional
 
+import numpy as np
+
 try:
     import mido
 except Exception as e:  # pragma: no cover
@@ -10,6 +14,9 @@ except Exception as e:  # pragma: no cover
 
 MAJOR_SCALE_PITCH_CLASSES = {0, 2, 4, 5, 7, 9, 11}
 
+# pitch class -> in C major, for vectorized lookups
+_MAJOR_SCALE_MASK = np.array([pc in MAJOR_SCALE_PITCH_CLASSES for pc in range(12)])
+
 PITCH_CLASS_TO_ABC = {
     0: 'C',
     1: '^C',
@@ -25,6 +32,35 @@ PITCH_CLASS_TO_ABC = {
     11: 'B',
 }
 
+ABC_TO_PC = {v: k for k, v in PITCH_CLASS_TO_ABC.items()}
+
+# PITCH_CLASS_TO_ABC as a tuple indexed by pitch class
+_PC_TO_ABC = tuple(PITCH_CLASS_TO_ABC[pc] for pc in range(12))
+
+# duration suffix keyed on round(duration_in_beats * 2): half, quarter, eighth
+_DUR_SUFFIX = {4: '2', 2: '', 1: '/'}
+
+# accidental spellings that take two characters of a token
+TWO_CHAR_HEADS = frozenset(('^C', '^D', '^F', '^G', '_B'))
+
+
+# Event codes recorded while scanning a MIDI track
+_EVENT_OFF = 0
+_EVENT_ON = 1
+
+# (starts, durations, pitches, velocities), one entry per note, sorted by start;
+# times are in beats
+NoteArrays = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def _empty_notes() -> NoteArrays:
+    return (
+        np.empty(0, dtype=np.float64),
+        np.empty(0, dtype=np.float64),
+        np.empty(0, dtype=np.int64),
+        np.empty(0, dtype=np.int64),
+    )
+
 
 class MidiMelodySimplifier:
     """Extract a simplified monophonic melody from a MIDI and export to ABC.
@@ -50,11 +86,12 @@ class MidiMelodySimplifier:
         base_length: str = '1/4',
         target_abc_line: Optional[str] = None,
     ) -> str:
-        notes = self._extract_notes_from_b64(midi_b64)
-        if not notes:
+        note_arrays = self._extract_notes_from_b64(midi_b64)
+        if note_arrays[0].size == 0:
             return self._format_abc([], include_headers, meter, base_length)
 
         if target_abc_line:
+            notes = self._notes_as_tuples(note_arrays)
             target_pcs, target_durs = self._parse_abc_line_to_pc_and_duration(target_abc_line)
             anchors = self._pick_anchors_guided_by_target(notes, len(target_pcs), target_pcs)
             transpose = self._choose_transpose_for_target(anchors, target_pcs)
@@ -62,7 +99,7 @@ class MidiMelodySimplifier:
             return self._format_abc([abc_line], include_headers, meter, base_length)
 
         segment_count = segments if segments is not None else self.default_segments
-        anchors = self._pick_segment_anchors(notes, segment_count)
+        anchors = self._pick_segment_anchors(note_arrays, segment_count)
 
         transpose = 0
         if align_first_to_c and anchors:
@@ -74,79 +111,152 @@ class MidiMelodySimplifier:
 
     # ------------------------ internals ------------------------
 
-    def _extract_notes_from_b64(self, midi_b64: str) -> List[Tuple[float, float, int, int]]:
+    def _extract_notes_from_b64(self, midi_b64: str) -> NoteArrays:
         if mido is None:
             raise RuntimeError('mido is required for MIDI parsing')
-        clean = ''.join(midi_b64.split())
-        clean += '=' * ((4 - len(clean) % 4) % 4)
-        data = base64.b64decode(clean)
+        try:
+            # non-alphabet characters (whitespace, newlines) are skipped when not validating
+            data = base64.b64decode(midi_b64, validate=False)
+        except binascii.Error:
+            # unpadded input: strip whitespace and pad before retrying
+            clean = ''.join(midi_b64.split())
+            clean += '=' * ((4 - len(clean) % 4) % 4)
+            data = base64.b64decode(clean)
         mid = mido.MidiFile(file=io.BytesIO(data))
-        # choose track with most note_on events
-        track = max(mid.tracks, key=lambda t: sum(1 for m in t if m.type == 'note_on' and getattr(m, 'velocity', 0) > 0))
-        ticks_per_beat = mid.ticks_per_beat
+        # scan every track once, counting note_on events as we go, and only
+        # build arrays for the densest one
+        best_events = None
+        best_count = -1
+        for track in mid.tracks:
+            count, events = self._scan_track(track)
+            if count > best_count:
+                best_events, best_count = events, count
+        if best_events is None:
+            return _empty_notes()
+        ticks, codes, pitches, vels = best_events
+        return self._pair_note_events(
+            np.asarray(ticks, dtype=np.int64),
+            np.asarray(codes, dtype=np.int8),
+            np.asarray(pitches, dtype=np.int64),
+            np.asarray(vels, dtype=np.int64),
+            float(mid.ticks_per_beat),
+        )
+
+    @staticmethod
+    def _scan_track(track) -> Tuple[int, Tuple[List[int], List[int], List[int], List[int]]]:
+        """Return (note_on count, (abs_ticks, event_codes, pitches, velocities)) for a track."""
+        ticks: List[int] = []
+        codes: List[int] = []
+        pitches: List[int] = []
+        vels: List[int] = []
+        on_count = 0
         abs_ticks = 0
-        open_starts: dict[int, List[int]] = {}
-        open_vels: dict[int, List[int]] = {}
-        collected: List[Tuple[float, float, int, int]] = []
         for msg in track:
             abs_ticks += msg.time
-            if msg.type == 'note_on' and msg.velocity > 0:
-                open_starts.setdefault(msg.note, []).append(abs_ticks)
-                open_vels.setdefault(msg.note, []).append(msg.velocity)
-            elif msg.type in ('note_off', 'note_on') and getattr(msg, 'velocity', 0) == 0:
-                if open_starts.get(msg.note):
-                    start = open_starts[msg.note].pop(0)
-                    vel = (open_vels.get(msg.note) or [64]).pop(0)
-                    start_q = start / float(ticks_per_beat)
-                    dur_q = (abs_ticks - start) / float(ticks_per_beat)
-                    # quantize to eighth-note grid to stabilize selections
-                    dur_q = round(dur_q * 8) / 8.0
-                    collected.append((start_q, dur_q, msg.note, vel))
-        collected.sort(key=lambda x: x[0])
-        return collected
+            msg_type = msg.type
+            if msg_type == 'note_on':
+                vel = msg.velocity
+                if vel > 0:
+                    code = _EVENT_ON
+                    on_count += 1
+                else:
+                    code = _EVENT_OFF
+            elif msg_type == 'note_off':
+                # release velocity is irrelevant; every note_off ends a note
+                vel = 0
+                code = _EVENT_OFF
+            else:
+                continue
+            ticks.append(abs_ticks)
+            codes.append(code)
+            pitches.append(msg.note)
+            vels.append(vel)
+        return on_count, (ticks, codes, pitches, vels)
+
+    @staticmethod
+    def _pair_note_events(
+        ticks: np.ndarray,
+        codes: np.ndarray,
+        pitches: np.ndarray,
+        vels: np.ndarray,
+        ticks_per_beat: float,
+    ) -> NoteArrays:
+        """Close each note-off against the earliest open note-on of the same pitch."""
+        start_parts: List[np.ndarray] = []
+        end_parts: List[np.ndarray] = []
+        pitch_parts: List[np.ndarray] = []
+        vel_parts: List[np.ndarray] = []
+        off_parts: List[np.ndarray] = []
+        for pitch in np.unique(pitches):
+            idx = np.flatnonzero(pitches == pitch)
+            is_on = codes[idx] == _EVENT_ON
+            on_idx = idx[is_on]
+            off_idx = idx[~is_on]
+            if on_idx.size == 0 or off_idx.size == 0:
+                continue
+            # An off only closes a note while one is open, so the running count of
+            # closed notes is m[j] = min(m[j-1] + 1, ons_before[j]); unrolled, that
+            # is j + min(1, running_min(ons_before - j)).
+            ons_before = np.cumsum(is_on)[~is_on]
+            j = np.arange(off_idx.size)
+            closed = j + np.minimum(1, np.minimum.accumulate(ons_before - j))
+            matched = np.diff(closed, prepend=0) > 0
+            paired_on = on_idx[closed[matched] - 1]
+            paired_off = off_idx[matched]
+            start_parts.append(ticks[paired_on])
+            end_parts.append(ticks[paired_off])
+            pitch_parts.append(pitches[paired_on])
+            vel_parts.append(vels[paired_on])
+            off_parts.append(paired_off)
+        if not start_parts:
+            return _empty_notes()
+        start_ticks = np.concatenate(start_parts)
+        end_ticks = np.concatenate(end_parts)
+        # sort by start, ties in the order the notes were closed
+        order = np.lexsort((np.concatenate(off_parts), start_ticks))
+        start_ticks = start_ticks[order]
+        end_ticks = end_ticks[order]
+        starts = start_ticks / ticks_per_beat
+        # quantize to eighth-note grid to stabilize selections
+        durs = np.rint((end_ticks - start_ticks) / ticks_per_beat * 8) / 8.0
+        return starts, durs, np.concatenate(pitch_parts)[order], np.concatenate(vel_parts)[order]
+
+    @staticmethod
+    def _notes_as_tuples(note_arrays: NoteArrays) -> List[Tuple[float, float, int, int]]:
+        starts, durs, pitches, vels = note_arrays
+        return list(zip(starts.tolist(), durs.tolist(), pitches.tolist(), vels.tolist()))
 
     def _pick_segment_anchors(
         self,
-        notes: List[Tuple[float, float, int, int]],
+        note_arrays: NoteArrays,
         segments: int,
     ) -> List[Tuple[float, float, int, int]]:
-        if not notes or segments <= 0:
+        starts, durs, pitches, vels = note_arrays
+        if starts.size == 0 or segments <= 0:
             return []
-        end_time = max(s + d for s, d, *_ in notes)
+        end_time = float(np.max(starts + durs))
         segment_len = end_time / segments
-        anchors: List[Tuple[float, float, int, int]] = []
-        for i in range(segments):
-            seg_start = i * segment_len
-            seg_end = (i + 1) * segment_len if i < segments - 1 else end_time + 1e-6
-            candidates: List[Tuple[float, float, float, int, int]] = []
-            for start, dur, pitch, vel in notes:
-                if seg_start <= start < seg_end:
-                    # salience: duration dominant, then velocity, then pitch height
-                    salience = dur + (vel / 127.0) * 0.1 + (pitch % 12 in MAJOR_SCALE_PITCH_CLASSES) * 0.05 + (pitch / 127.0) * 0.02
-                    candidates.append((salience, start, dur, pitch, vel))
-            if not candidates:
-                continue
-            candidates.sort(key=lambda x: x[0], reverse=True)
-            _, s, d, p, v = candidates[0]
-            anchors.append((s, d, p, v))
-        return anchors
+        # segment i covers [i * segment_len, (i + 1) * segment_len); the last one runs to the end
+        seg_bounds = np.arange(segments) * segment_len
+        seg_idx = np.searchsorted(seg_bounds, starts, side='right') - 1
+        # salience: duration dominant, then velocity, then pitch height
+        salience = durs + (vels / 127.0) * 0.1 + _MAJOR_SCALE_MASK[pitches % 12] * 0.05 + (pitches / 127.0) * 0.02
+        # best note per segment: highest salience, earliest note on ties
+        order = np.lexsort((np.arange(starts.size), -salience, seg_idx))
+        _, first = np.unique(seg_idx[order], return_index=True)
+        picked = order[first]
+        return list(zip(
+            starts[picked].tolist(),
+            durs[picked].tolist(),
+            pitches[picked].tolist(),
+            vels[picked].tolist(),
+        ))
 
     def _to_abc_line(self, anchors: List[Tuple[float, float, int, int]], transpose: int) -> str:
         tokens: List[str] = []
         for _, dur, midi_pitch, _ in anchors:
-            pc = (midi_pitch + transpose) % 12
-            pitch_token = PITCH_CLASS_TO_ABC[pc]
             # collapse durations to quarters/halves/eighths only
-            q = round(dur * 2) / 2.0
-            if abs(q - 2.0) < 1e-6:
-                suf = '2'
-            elif abs(q - 1.0) < 1e-6:
-                suf = ''
-            elif abs(q - 0.5) < 1e-6:
-                suf = '/'
-            else:
-                suf = ''
-            tokens.append(pitch_token + suf)
+            tokens.append(_PC_TO_ABC[(midi_pitch + transpose) % 12] + _DUR_SUFFIX.get(int(round(dur * 2)), ''))
         return ' '.join(tokens)
 
     # --- target-guided helpers ---
@@ -155,19 +265,15 @@ class MidiMelodySimplifier:
         tokens = [t for t in line.strip().split() if t]
         pcs: List[int] = []
         durs: List[float] = []
-        abc_to_pc = {v: k for k, v in PITCH_CLASS_TO_ABC.items()}
         for tok in tokens:
             # longest-match for accidentals first
-            if tok[:2] in ('^C', '_B'):
-                head = tok[:2]
-                rest = tok[2:]
-            elif tok[:2] in ('^D', '^F', '^G'):
+            if tok[:2] in TWO_CHAR_HEADS:
                 head = tok[:2]
                 rest = tok[2:]
             else:
                 head = tok[:1]
                 rest = tok[1:]
-            pc = abc_to_pc.get(head)
+            pc = ABC_TO_PC.get(head)
             if pc is None:
                 continue
             if rest == '2':
@@ -228,27 +334,20 @@ class MidiMelodySimplifier:
             # force to target pitch class if provided
             if i < len(target_pcs):
                 pc = target_pcs[i]
-            pit = PITCH_CLASS_TO_ABC[pc]
             dur = target_durs[i] if i < len(target_durs) else 1.0
-            if abs(dur - 2.0) < 1e-6:
-                suf = '2'
-            elif abs(dur - 0.5) < 1e-6:
-                suf = '/'
-            else:
-                suf = ''
-            tokens.append(pit + suf)
+            tokens.append(_PC_TO_ABC[pc] + _DUR_SUFFIX.get(int(round(dur * 2)), ''))
         return ' '.join(tokens)
 
     def _format_abc(self, lines: List[str], include_headers: bool, meter: str, base_length: str) -> str:
         if not include_headers:
             return '\n'.join(lines)
-        header = [
-            'X:1',
-            'M:' + meter,
-            'L:' + base_length,
-            'K:C',
-        ]
-        return '\n'.join(header + lines)
+        return '\n'.join([_abc_header(meter, base_length), *lines])
+
+
+@lru_cache(maxsize=16)
+def _abc_header(meter: str, base_length: str) -> str:
+    """Header block for the given meter and unit length."""
+    return '\n'.join(['X:1', 'M:' + meter, 'L:' + base_length, 'K:C'])
 
 
 def simplify_midi_base64_to_abc(
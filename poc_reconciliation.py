@@ -4,46 +4,353 @@ POC: Tab Reconciliation with GPT-4
 Tests retrieving 3 different tabs and using GPT-4 to reconcile them into ABC notation
 """
 
+import asyncio
+import hashlib
+import json
 import subprocess
+import tempfile
+import threading
 import re
-import json
 import html as html_module
+import io
+import itertools
 import os
-from typing import List, Dict
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Tuple
+
+import openai
+
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import pycurl
+except ImportError:
+    pycurl = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', 'YOUR_KEY_HERE')
 
+# Optional GGUF model (e.g. Phi-3-mini Q4_K_M) for offline reconciliation
+LOCAL_LLM_PATH = os.getenv('LOCAL_LLM_PATH')
+_local_llm = None
 
-def fetch_with_curl(url: str) -> str:
-    """Fetch URL using system curl command"""
-    curl_command = [
+_JS_STORE_RE = re.compile(r'<div class="js-store" data-content="([^"]+)"')
+UG_CONTENT_PATH = 'store.page.data.tab_view.wiki_tab.content'
+REQUIRED_ABC_HEADERS = 'XTMLK'
+_ABC_HEADERS_RE = re.compile(r'^([XTMLK]):', re.MULTILINE)
+
+
+FETCH_TIMEOUT = 15
+READ_CHUNK = 8192
+TAB_CACHE_TTL = 24 * 3600  # seconds; tab pages rarely change within a day
+GPT_CACHE_TTL = 7 * 24 * 3600
+PREVIEW_LINES = 30  # non-blank tab lines sent to GPT per source
+SKELETON_SOURCE_LINES = 120  # non-blank tab lines read when extracting a skeleton
+GPT_MODEL = "gpt-4o-mini"
+GPT_TEMPERATURE = 0.3
+
+
+class FileCache:
+    """Keyed cache with a TTL, held in memory and mirrored to a JSON file"""
+    
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self.stats = {'hits': 0, 'misses': 0}
+        # The curl fallback pool calls get/set from several threads at once
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+    
+    @staticmethod
+    def _key(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+    
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(self._key(key))
+            if entry and time.time() - entry['ts'] < self.ttl:
+                self.stats['hits'] += 1
+                return entry['value']
+            self.stats['misses'] += 1
+            return None
+    
+    def set(self, key: str, value):
+        with self._lock:
+            now = time.time()
+            self._entries = {
+                k: entry for k, entry in self._entries.items()
+                if now - entry['ts'] < self.ttl
+            }
+            self._entries[self._key(key)] = {'value': value, 'ts': now}
+            try:
+                with open(self.path, 'w', encoding='utf-8') as f:
+                    json.dump(self._entries, f)
+            except OSError as e:
+                print(f"Warning: could not persist cache {self.path}: {e}")
+
+
+# Fetched tab HTML keyed by URL, and GPT results keyed by the full request
+tab_cache = FileCache('.tabcache.json', TAB_CACHE_TTL)
+gpt_cache = FileCache('.gptcache.json', GPT_CACHE_TTL)
+
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+
+# Kept for the life of the process so libcurl can reuse connections
+_curl_multi = None
+
+
+def curl_command(*urls: str) -> List[str]:
+    """Build the curl command line used to fetch tab pages"""
+    return [
         'curl', '-s', '-L',
-        '-H', 'User-Agent: Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+        '-H', f'User-Agent: {USER_AGENT}',
         '--compressed',
-        url
+        *urls
     ]
+
+
+class JsStoreScanner:
+    """Buffers a streamed page until UG's js-store attribute has been closed"""
+    
+    MARKER = b'<div class="js-store" data-content="'
+    
+    def __init__(self):
+        self.buffer = bytearray()
+        self.done = False
+        self._in_value = False
+        self._scanned = 0
+    
+    def feed(self, chunk: bytes) -> bool:
+        """Append a chunk; True once the rest of the page is not needed"""
+        self.buffer += chunk
+        if not self._in_value:
+            start = max(0, self._scanned - len(self.MARKER) + 1)
+            pos = self.buffer.find(self.MARKER, start)
+            if pos < 0:
+                self._scanned = len(self.buffer)
+                return False
+            self._in_value = True
+            self._scanned = pos + len(self.MARKER)
+        self.done = self.buffer.find(b'"', self._scanned) >= 0
+        self._scanned = len(self.buffer)
+        return self.done
+    
+    def text(self) -> str:
+        return self.buffer.decode('utf-8', errors='replace')
+
+
+def fetch_with_curl(url: str) -> str:
+    """Fetch URL using system curl command, stopping once js-store is read"""
+    cached = tab_cache.get(url)
+    if cached is not None:
+        return cached
     
     try:
-        result = subprocess.run(curl_command, capture_output=True, text=True, timeout=15)
-        return result.stdout if result.returncode == 0 else None
+        proc = subprocess.Popen(curl_command(url), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        timer = threading.Timer(FETCH_TIMEOUT, proc.kill)
+        timer.start()
+        scanner = JsStoreScanner()
+        try:
+            while True:
+                chunk = proc.stdout.read1(READ_CHUNK)
+                if not chunk or scanner.feed(chunk):
+                    break
+        finally:
+            timer.cancel()
+            if proc.poll() is None:
+                proc.terminate()
+            proc.wait()
+            proc.stdout.close()
+        
+        if not scanner.done and proc.returncode != 0:
+            return None
+        html_content = scanner.text()
+        if html_content:
+            tab_cache.set(url, html_content)
+        return html_content
     except Exception as e:
         print(f"Error fetching {url}: {e}")
         return None
 
 
+def fetch_many_with_pycurl(urls: List[str]) -> Dict[str, str]:
+    """Fetch URLs in parallel on one libcurl multi handle"""
+    global _curl_multi
+    if _curl_multi is None:
+        _curl_multi = pycurl.CurlMulti()
+    multi = _curl_multi
+    
+    pages = {}
+    transfers = {}
+    for url in urls:
+        cached = tab_cache.get(url)
+        if cached is not None:
+            pages[url] = cached
+            continue
+        if url in transfers:
+            continue
+        
+        scanner = JsStoreScanner()
+        handle = pycurl.Curl()
+        handle.setopt(pycurl.URL, url)
+        handle.setopt(pycurl.USERAGENT, USER_AGENT)
+        handle.setopt(pycurl.FOLLOWLOCATION, 1)
+        handle.setopt(pycurl.ENCODING, '')  # accept every encoding libcurl supports
+        handle.setopt(pycurl.TIMEOUT, FETCH_TIMEOUT)
+        # Returning 0 from the write callback aborts the transfer early
+        handle.setopt(pycurl.WRITEFUNCTION, lambda data, scanner=scanner: 0 if scanner.feed(data) else None)
+        multi.add_handle(handle)
+        transfers[url] = (handle, scanner)
+    
+    active = len(transfers)
+    while active:
+        ret, active = multi.perform()
+        if ret == pycurl.E_CALL_MULTI_PERFORM:
+            continue
+        if active:
+            multi.select(1.0)
+    
+    failed = {}
+    while True:
+        queued, _, errors = multi.info_read()
+        for handle, _, message in errors:
+            failed[handle] = message
+        if not queued:
+            break
+    
+    for url, (handle, scanner) in transfers.items():
+        multi.remove_handle(handle)
+        handle.close()
+        if handle in failed and not scanner.done:
+            print(f"Error fetching {url}: {failed[handle]}")
+            pages[url] = None
+            continue
+        html_content = scanner.text()
+        if html_content:
+            tab_cache.set(url, html_content)
+        pages[url] = html_content
+    
+    return pages
+
+
+def fetch_many_with_curl(urls: List[str]) -> Dict[str, str]:
+    """Fetch URLs with one curl process that runs the transfers in parallel
+    
+    Unlike fetch_with_curl, curl can't be stopped per transfer here, so whole
+    pages are downloaded; only the part up to the js-store attribute is kept.
+    """
+    pages = {}
+    pending = []
+    for url in urls:
+        cached = tab_cache.get(url)
+        if cached is not None:
+            pages[url] = cached
+        elif url not in pending:
+            pending.append(url)
+    
+    if not pending:
+        return pages
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        command = curl_command() + [
+            '--max-time', str(FETCH_TIMEOUT),
+            '--parallel', '--parallel-max', '8',
+            '-w', '%{urlnum} %{exitcode}\n'
+        ]
+        for i, url in enumerate(pending):
+            command += ['-o', os.path.join(tmp_dir, str(i)), url]
+        
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=FETCH_TIMEOUT + 5)
+        except subprocess.TimeoutExpired:
+            # Retrying per URL could double the wait; count the batch as failed
+            print(f"Timed out fetching {len(pending)} URLs")
+            pages.update(dict.fromkeys(pending))
+            return pages
+        except Exception as e:
+            print(f"Error fetching {len(pending)} URLs: {e}")
+            pages.update(dict.fromkeys(pending))
+            return pages
+        
+        exit_codes = dict(line.split() for line in result.stdout.splitlines() if line.strip())
+        
+        if not exit_codes and result.returncode != 0:
+            # curl predates --parallel/%{urlnum} and rejected the options:
+            # one process per URL, in threads
+            with ThreadPoolExecutor(max_workers=min(8, len(pending))) as pool:
+                pages.update(zip(pending, pool.map(fetch_with_curl, pending)))
+            return pages
+        
+        for i, url in enumerate(pending):
+            if exit_codes.get(str(i)) != '0':
+                pages[url] = None
+                continue
+            try:
+                scanner = JsStoreScanner()
+                with open(os.path.join(tmp_dir, str(i)), 'rb') as f:
+                    for chunk in iter(lambda: f.read(READ_CHUNK), b''):
+                        if scanner.feed(chunk):
+                            break
+                html_content = scanner.text()
+            except OSError as e:
+                # curl skips creating the -o file for some transfers (e.g. empty bodies)
+                print(f"Error reading response for {url}: {e}")
+                pages[url] = None
+                continue
+            if html_content:
+                tab_cache.set(url, html_content)
+            pages[url] = html_content
+    
+    return pages
+
+
 def extract_ultimate_guitar_json(html_content: str) -> str:
     """Extract tab content from Ultimate Guitar's JSON data store"""
-    pattern = r'<div class="js-store" data-content="([^"]+)"'
-    match = re.search(pattern, html_content)
+    decoded_json = None
     
-    if not match:
-        return None
+    if LexborHTMLParser is not None:
+        # Lexbor hands back the attribute already HTML-unescaped
+        node = LexborHTMLParser(html_content).css_first('div.js-store')
+        if node is not None:
+            decoded_json = node.attributes.get('data-content')
+    
+    if not decoded_json:
+        match = _JS_STORE_RE.search(html_content)
+        
+        if not match:
+            return None
+        
+        decoded_json = html_module.unescape(match.group(1))
     
-    encoded_json = match.group(1)
-    decoded_json = html_module.unescape(encoded_json)
+    if ijson is not None:
+        # Stream to the one value we need instead of building the whole store
+        try:
+            return next(ijson.items(io.BytesIO(decoded_json.encode()), UG_CONTENT_PATH), None)
+        except Exception:
+            return None
     
     try:
-        data = json.loads(decoded_json)
+        data = _json.loads(decoded_json)
         
         if 'store' in data and 'page' in data['store']:
             page_data = data['store']['page']
@@ -58,44 +365,66 @@ def extract_ultimate_guitar_json(html_content: str) -> str:
     return None
 
 
+# For POC, using known Baby Shark URLs from Ultimate Guitar
+# In production, you'd use Brave Search API with site:tabs.ultimate-guitar.com
+BABY_SHARK_URLS = (
+    "https://tabs.ultimate-guitar.com/tab/misc-children/pinkfong-baby-shark-tabs-2223681",
+    "https://tabs.ultimate-guitar.com/tab/misc-children/baby-shark-chords-2555770",
+    "https://tabs.ultimate-guitar.com/tab/pinkfong/baby-shark-chords-2574890"
+)
+
+
+@lru_cache(maxsize=512)
+def _search_cached(song_key: str) -> Tuple[str, ...]:
+    """Resolve tab URLs for a normalised (stripped, lowercased) song name"""
+    if 'baby shark' in song_key:
+        return BABY_SHARK_URLS
+    elif 'twinkle' in song_key:
+        return BABY_SHARK_URLS[:1]  # Just use one for now
+    else:
+        return BABY_SHARK_URLS
+
+
 def search_ultimate_guitar_tabs(song_name: str) -> List[str]:
     """Search for multiple Ultimate Guitar tabs for a song"""
     
     print(f"\n🔍 Searching for Ultimate Guitar tabs: '{song_name}'")
     
-    # For POC, using known Baby Shark URLs from Ultimate Guitar
-    # In production, you'd use Brave Search API with site:tabs.ultimate-guitar.com
-    
-    baby_shark_urls = [
-        "https://tabs.ultimate-guitar.com/tab/misc-children/pinkfong-baby-shark-tabs-2223681",
-        "https://tabs.ultimate-guitar.com/tab/misc-children/baby-shark-chords-2555770",
-        "https://tabs.ultimate-guitar.com/tab/pinkfong/baby-shark-chords-2574890"
-    ]
-    
-    twinkle_urls = [
-        "https://tabs.ultimate-guitar.com/tab/misc-traditional/twinkle-twinkle-little-star-chords-800415",
-        "https://tabs.ultimate-guitar.com/tab/traditional/twinkle-twinkle-little-star-chords-1123456",
-        "https://tabs.ultimate-guitar.com/tab/nursery-rhymes/twinkle-twinkle-little-star-tabs-1234567"
-    ]
-    
-    if 'baby shark' in song_name.lower():
-        return baby_shark_urls
-    elif 'twinkle' in song_name.lower():
+    song_key = song_name.strip().lower()
+    # Printed here rather than in _search_cached so it shows on every lookup
+    if 'twinkle' in song_key and 'baby shark' not in song_key:
         print("  (Note: Using Baby Shark URLs for demo - Twinkle URLs may not exist)")
-        return baby_shark_urls[:1]  # Just use one for now
-    else:
-        return baby_shark_urls
+    
+    return list(_search_cached(song_key))
+
+
+def build_preview(tab_content: str, max_lines: int = PREVIEW_LINES) -> str:
+    """Condense a tab for the prompt: no blank lines, no consecutive repeats"""
+    lines = (line.rstrip() for line in io.StringIO(tab_content))
+    kept = (line for line, _ in itertools.groupby(line for line in lines if line.strip()))
+    return '\n'.join(itertools.islice(kept, max_lines))
+
+
+def fetch_pages(urls: List[str]) -> Dict[str, str]:
+    """Fetch pages concurrently, preferring pycurl over the curl executable"""
+    if pycurl is not None:
+        return fetch_many_with_pycurl(urls)
+    return fetch_many_with_curl(urls)
 
 
 def fetch_tabs(urls: List[str]) -> List[Dict]:
     """Fetch tab content from multiple URLs"""
     
+    print(f"\n📄 Fetching {len(urls)} sources concurrently...")
+    pages = fetch_pages(urls)
+    print(f"  Tab cache: {tab_cache.stats['hits']} hits, {tab_cache.stats['misses']} misses")
+    
     tabs = []
     
     for i, url in enumerate(urls, 1):
-        print(f"\n📄 Fetching source {i}/{len(urls)}: {url}")
+        print(f"\n📄 Source {i}/{len(urls)}: {url}")
         
-        html_content = fetch_with_curl(url)
+        html_content = pages[url]
         
         if not html_content:
             print(f"  ✗ Failed to fetch")
@@ -106,11 +435,10 @@ def fetch_tabs(urls: List[str]) -> List[Dict]:
         tab_content = extract_ultimate_guitar_json(html_content)
         
         if tab_content:
-            lines = len(tab_content.split('\n'))
+            lines = tab_content.count('\n') + 1
             print(f"  ✓ Extracted tab ({lines} lines)")
             
-            # Get first 40 lines as a preview
-            preview = '\n'.join(tab_content.split('\n')[:40])
+            preview = build_preview(tab_content)
             
             tabs.append({
                 'url': url,
@@ -124,38 +452,18 @@ def fetch_tabs(urls: List[str]) -> List[Dict]:
     return tabs
 
 
-def reconcile_tabs_with_gpt4(tabs: List[Dict], song_name: str) -> Dict:
-    """Use GPT-4 to reconcile multiple tab sources into ABC notation"""
-    
-    if OPENAI_API_KEY == 'YOUR_KEY_HERE':
-        print("\n⚠️  No OpenAI API key set - returning mock reconciliation")
-        return {
-            'abc_notation': mock_abc_notation(song_name),
-            'confidence': 0.75,
-            'notes': 'Mock reconciliation (no API key provided)'
-        }
-    
-    print(f"\n🤖 Reconciling {len(tabs)} tabs with GPT-4...")
-    
-    # Prepare the prompt
-    versions_text = ""
-    for i, tab in enumerate(tabs, 1):
-        versions_text += f"\n--- VERSION {i} (from {tab['url']}) ---\n"
-        versions_text += tab['preview']
-        versions_text += "\n" + "="*80 + "\n"
-    
-    prompt = f"""You are a music transcription expert. You have {len(tabs)} different guitar tab versions of "{song_name}".
+RECONCILE_SYSTEM_PROMPT = "You are a music notation expert. Return only valid JSON."
 
-Your task is to reconcile them into a single, accurate version in ABC notation format.
+RECONCILE_INSTRUCTIONS = """You are a music transcription expert. You will be given a song title and several different guitar tab versions of that song. Each version carries either a JSON skeleton (key, chords, melody, lyrics) extracted from the tab, or, when no skeleton is available, a "preview" holding the first lines of the raw tab text. Read chords, melody, and lyrics from whichever form each version has.
 
-{versions_text}
+Your task is to reconcile them into a single, accurate version in ABC notation format.
 
 Instructions:
 1. Analyze all versions and identify the most reliable chord progressions, melody, and any lyric cues
 2. Extract the first 16 bars (measures), extending repeating patterns if needed to cover 16 bars
 3. Identify the key signature from the tabs
 4. Create ABC notation with:
-   - Standard ABC headers (X, T, M, L, K)
+   - Standard ABC headers (X, T, M, L, K), using the song title for T:
    - Chord symbols above the staff (use "C", "G", "Am" format)
    - Simple melody line (quarter notes and half notes)
    - A lyric line using `w:` that aligns syllables to the melody (invent simple syllables like "La" when lyrics are missing)
@@ -164,40 +472,215 @@ Instructions:
 5. Output VALID ABC notation format that can be rendered by abcjs
 
 Return ONLY a JSON object with this structure (no markdown, no code blocks):
-{{ 
-    "abc_notation": "X:1\\nT:{song_name}\\nM:4/4\\nL:1/4\\nK:C\\n\\"C\\"C D E F | \\"G\\"G2 A2 | ...\\nw: La la la la | ...",
+{ 
+    "abc_notation": "X:1\\nT:Song Name\\nM:4/4\\nL:1/4\\nK:C\\n\\"C\\"C D E F | \\"G\\"G2 A2 | ...\\nw: La la la la | ...",
     "confidence": 0.85,
     "key": "C",
     "notes": "Brief explanation of reconciliation decisions"
-}}"""
+}"""
+
+
+SKELETON_INSTRUCTIONS = """You are a music transcription expert. You will be given one guitar tab or chord sheet.
 
+Extract its musical skeleton for the first 16 bars (measures):
+- "key": the key signature, e.g. "C" or "Am"
+- "chords": the chord progression in order, one entry per bar, e.g. ["C", "C", "G", "Am"]
+- "melody": the melody as space-separated note names with "|" between bars, or "" if the tab has no melody
+- "lyrics": any lyric cues for those bars, or ""
+
+Return ONLY a JSON object with exactly those four keys."""
+
+
+_openai_client = None
+
+
+def _get_client():
+    """Return the process-wide OpenAI client so its connection pool is reused"""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = openai.OpenAI(api_key=OPENAI_API_KEY, timeout=30.0, max_retries=2)
+    return _openai_client
+
+
+async def _extract_skeleton(client, tab: Dict) -> Dict:
+    """Reduce one tab to a small chord/melody skeleton, cached by its content"""
+    source = build_preview(tab['content'], SKELETON_SOURCE_LINES)
+    cache_key = f"skeleton:{GPT_MODEL}:{source}"
+    
+    cached = gpt_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        import openai
-        
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        
-        response = client.chat.completions.create(
-            model="gpt-4",
+        response = await client.chat.completions.create(
+            model=GPT_MODEL,
             messages=[
-                {"role": "system", "content": "You are a music notation expert. Return only valid JSON."},
-                {"role": "user", "content": prompt}
+                {"role": "system", "content": RECONCILE_SYSTEM_PROMPT},
+                {"role": "user", "content": SKELETON_INSTRUCTIONS},
+                {"role": "user", "content": source}
             ],
-            temperature=0.3,
+            temperature=0,
+            max_tokens=500,
+            response_format={"type": "json_object"}
+        )
+        skeleton = _json.loads(response.choices[0].message.content)
+    except Exception as e:
+        # Let the reconciler work from the raw preview instead
+        print(f"  ✗ Skeleton extraction failed for {tab['url']}: {e}")
+        return {'preview': tab['preview']}
+    
+    gpt_cache.set(cache_key, skeleton)
+    return skeleton
+
+
+async def _extract_skeletons(tabs: List[Dict]) -> List[Dict]:
+    # Async clients are bound to the event loop, so this one lives per run
+    client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY, timeout=30.0, max_retries=2)
+    try:
+        return await asyncio.gather(*(_extract_skeleton(client, tab) for tab in tabs))
+    finally:
+        await client.close()
+
+
+def _reconcile_messages(versions: List[Dict], song_name: str) -> List[Dict]:
+    # Static instructions go first so OpenAI can reuse the cached prefix;
+    # only the song and versions vary between calls
+    dynamic_input = f"Song: {song_name}\n\nVERSIONS ({len(versions)}):\n{json.dumps(versions, ensure_ascii=False)}"
+    return [
+        {"role": "system", "content": RECONCILE_SYSTEM_PROMPT},
+        {"role": "user", "content": RECONCILE_INSTRUCTIONS},
+        {"role": "user", "content": dynamic_input}
+    ]
+
+
+def _get_local_llm():
+    """Load the quantized local model once, on first use"""
+    global _local_llm
+    if _local_llm is None:
+        from llama_cpp import Llama
+        _local_llm = Llama(
+            model_path=LOCAL_LLM_PATH,
+            n_ctx=4096,
+            n_threads=os.cpu_count(),
+            verbose=False
+        )
+    return _local_llm
+
+
+def reconcile_tabs_locally(tabs: List[Dict], song_name: str) -> Dict:
+    """Reconcile with the local model; None if unavailable or the ABC is invalid"""
+    print(f"\n🖥️  Reconciling {len(tabs)} tabs with local model {os.path.basename(LOCAL_LLM_PATH)}...")
+    
+    versions = [
+        {'version': i, 'source': tab['url'], 'preview': tab['preview']}
+        for i, tab in enumerate(tabs, 1)
+    ]
+    
+    try:
+        response = _get_local_llm().create_chat_completion(
+            messages=_reconcile_messages(versions, song_name),
+            response_format={"type": "json_object"},
+            temperature=GPT_TEMPERATURE,
             max_tokens=1000
         )
+        result = _json.loads(response['choices'][0]['message']['content'])
+        # Valid JSON isn't necessarily an object (the model can return a list or null)
+        if not isinstance(result, dict):
+            raise ValueError(f"expected a JSON object, got {type(result).__name__}")
+    except Exception as e:
+        print(f"  ✗ Local reconciliation failed: {e}")
+        return None
+    
+    abc_notation = result.get('abc_notation', '')
+    if not isinstance(abc_notation, str) or not validate_abc(abc_notation):
+        print("  ✗ Local model returned invalid ABC notation")
+        return None
+    
+    print(f"  ✓ Reconciliation complete (confidence: {result.get('confidence', 0)})")
+    return result
+
+
+def reconcile_tabs_with_gpt4(tabs: List[Dict], song_name: str, use_local: bool = True) -> Dict:
+    """Use GPT-4 to reconcile multiple tab sources into ABC notation
+    
+    With use_local set and LOCAL_LLM_PATH configured, a local quantized model
+    is tried first and GPT is only called when its output fails validation.
+    """
+    
+    if use_local and LOCAL_LLM_PATH:
+        result = reconcile_tabs_locally(tabs, song_name)
+        if result is not None:
+            return result
+        print("  Falling back to OpenAI")
+    
+    if OPENAI_API_KEY == 'YOUR_KEY_HERE':
+        print("\n⚠️  No OpenAI API key set - returning mock reconciliation")
+        return {
+            'abc_notation': mock_abc_notation(song_name),
+            'confidence': 0.75,
+            'notes': 'Mock reconciliation (no API key provided)'
+        }
+    
+    print(f"\n🤖 Reconciling {len(tabs)} tabs with GPT-4...")
+    
+    try:
+        # Map: reduce each tab to a skeleton (cached per tab, run concurrently)
+        skeletons = asyncio.run(_extract_skeletons(tabs))
+        versions = [
+            {'version': i, 'source': tab['url'], **skeleton}
+            for i, (tab, skeleton) in enumerate(zip(tabs, skeletons), 1)
+        ]
+        
+        # Reduce: one call over the skeletons
+        messages = _reconcile_messages(versions, song_name)
+        
+        # Near-deterministic requests are safe to answer from cache
+        cacheable = GPT_TEMPERATURE <= 0.3
+        cache_key = json.dumps({
+            "model": GPT_MODEL,
+            "messages": messages,
+            "temperature": GPT_TEMPERATURE,
+            "song": song_name
+        }, sort_keys=True)
+        
+        if cacheable:
+            cached = gpt_cache.get(cache_key)
+            if cached is not None:
+                print(f"  ✓ Using cached reconciliation (confidence: {cached.get('confidence', 0)})")
+                return cached
+        
+        client = _get_client()
+        
+        response = client.chat.completions.create(
+            model=GPT_MODEL,
+            messages=messages,
+            temperature=GPT_TEMPERATURE,
+            max_tokens=1000,
+            response_format={"type": "json_object"},
+            stream=True
+        )
         
-        result_text = response.choices[0].message.content.strip()
+        # Echo tokens as they arrive so the output is visible before it completes
+        parts = []
+        for chunk in response:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content or ""
+            if text:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+                parts.append(text)
+        print()
         
-        # Try to extract JSON (sometimes GPT wraps it in markdown)
-        if '```' in result_text:
-            json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', result_text, re.DOTALL)
-            if json_match:
-                result_text = json_match.group(1)
+        result_text = "".join(parts).strip()
         
-        result = json.loads(result_text)
+        result = _json.loads(result_text)
         
         print(f"  ✓ Reconciliation complete (confidence: {result.get('confidence', 0)})")
         
+        if cacheable:
+            gpt_cache.set(cache_key, result)
+        
         return result
         
     except Exception as e:
@@ -221,8 +704,8 @@ K:C
 
 def validate_abc(abc_notation: str) -> bool:
     """Validate ABC notation has required headers"""
-    required = ['X:', 'T:', 'M:', 'L:', 'K:']
-    return all(header in abc_notation for header in required)
+    found = {m.group(1) for m in _ABC_HEADERS_RE.finditer(abc_notation)}
+    return len(found) == len(REQUIRED_ABC_HEADERS)
 
 
 def main():
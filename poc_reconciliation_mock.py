@@ -5,11 +5,18 @@ Simulates 3 different tab sources to test GPT-4 reconciliation
 """
 
 import os
+import sys
 import json
+import logging
 import re
 
+import openai
+
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', 'YOUR_KEY_HERE')
 
+REQUIRED_ABC_HEADERS = 'XTMLK'
+_ABC_HEADERS_RE = re.compile(r'^([XTMLK]):', re.MULTILINE)
+
 # Simulate 3 different tab versions of "Twinkle Twinkle Little Star"
 MOCK_TABS = [
     {
@@ -80,38 +87,19 @@ Tempo: 80 BPM
 ]
 
 
-def reconcile_tabs_with_gpt4(tabs, song_name):
-    """Use GPT-4 to reconcile multiple tab sources"""
-    
-    if OPENAI_API_KEY == 'YOUR_KEY_HERE':
-        print("\n⚠️  No OpenAI API key - skipping GPT-4 reconciliation")
-        print("To test with GPT-4: export OPENAI_API_KEY='your-key'")
-        return None
-    
-    print(f"\n🤖 Reconciling {len(tabs)} versions with GPT-4...")
-    
-    # Build prompt
-    versions_text = ""
-    for i, tab in enumerate(tabs, 1):
-        versions_text += f"\n{'='*70}\n"
-        versions_text += f"VERSION {i}: {tab['source']}\n"
-        versions_text += f"{'='*70}\n"
-        versions_text += tab['content']
-        versions_text += "\n"
-    
-    prompt = f"""You are a music transcription expert specializing in ABC notation.
+RECONCILE_SYSTEM_PROMPT = "You are an expert in music notation, specifically ABC notation. Always return valid JSON."
 
-I have {len(tabs)} different versions of "{song_name}" from guitar tabs and chord sheets. 
-Your task: Reconcile these into ONE accurate ABC notation for the first 16 bars, including a lyric line.
+RECONCILE_INSTRUCTIONS = """You are a music transcription expert specializing in ABC notation.
 
-{versions_text}
+You will be given a song title and several different versions of that song from guitar tabs and chord sheets.
+Your task: Reconcile these into ONE accurate ABC notation for the first 16 bars, including a lyric line.
 
 Requirements:
 1. Analyze all versions to identify the consensus melody, chords, and any lyric cues
 2. Generate ABC notation for the FIRST 16 BARS (extend repeating sections as needed)
 3. Use these ABC notation standards:
    - X:1 (reference number)
-   - T:{song_name} (title)
+   - T:<song title> (title)
    - M:4/4 (time signature)
    - L:1/4 (default note length - quarter note)
    - K:C (key signature - use the key from the tabs)
@@ -133,39 +121,78 @@ K:C
 w: La la la la | La la la la | La la la la | La la la la |
 
 Return ONLY a JSON object (no markdown, no code blocks):
-{{
+{
     "abc_notation": "X:1\\nT:Song Name\\n...",
     "confidence": 0.90,
     "key": "C",
     "time_signature": "4/4",
     "notes": "Brief reconciliation decisions"
-}}"""
+}"""
+
+
+_openai_client = None
+
+
+def _get_client():
+    """Return the process-wide OpenAI client so its connection pool is reused"""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = openai.OpenAI(api_key=OPENAI_API_KEY, timeout=30.0, max_retries=2)
+    return _openai_client
+
+
+def reconcile_tabs_with_gpt4(tabs, song_name):
+    """Use GPT-4 to reconcile multiple tab sources"""
+    
+    if OPENAI_API_KEY == 'YOUR_KEY_HERE':
+        print("\n⚠️  No OpenAI API key - skipping GPT-4 reconciliation")
+        print("To test with GPT-4: export OPENAI_API_KEY='your-key'")
+        return None
+    
+    print(f"\n🤖 Reconciling {len(tabs)} versions with GPT-4...")
+    
+    # Build prompt
+    versions_text = ""
+    for i, tab in enumerate(tabs, 1):
+        versions_text += f"\n{'='*70}\n"
+        versions_text += f"VERSION {i}: {tab['source']}\n"
+        versions_text += f"{'='*70}\n"
+        versions_text += tab['content']
+        versions_text += "\n"
+    
+    # Static instructions go first so OpenAI can reuse the cached prefix;
+    # only the song and tab versions vary between calls
+    dynamic_input = f"Song: {song_name}\n\nVERSIONS ({len(tabs)}):\n{versions_text}"
 
     try:
-        import openai
-        
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
+        client = _get_client()
         
         response = client.chat.completions.create(
-            model="gpt-4",
+            model="gpt-4o-mini",
             messages=[
-                {
-                    "role": "system", 
-                    "content": "You are an expert in music notation, specifically ABC notation. Always return valid JSON."
-                },
-                {"role": "user", "content": prompt}
+                {"role": "system", "content": RECONCILE_SYSTEM_PROMPT},
+                {"role": "user", "content": RECONCILE_INSTRUCTIONS},
+                {"role": "user", "content": dynamic_input}
             ],
             temperature=0.2,
-            max_tokens=1500
+            max_tokens=1500,
+            response_format={"type": "json_object"},
+            stream=True
         )
         
-        result_text = response.choices[0].message.content.strip()
+        # Echo tokens as they arrive so the output is visible before it completes
+        parts = []
+        for chunk in response:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content or ""
+            if text:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+                parts.append(text)
+        print()
         
-        # Extract JSON if wrapped in markdown
-        if '```' in result_text:
-            json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', result_text, re.DOTALL)
-            if json_match:
-                result_text = json_match.group(1)
+        result_text = "".join(parts).strip()
         
         result = json.loads(result_text)
         
@@ -177,11 +204,21 @@ Return ONLY a JSON object (no markdown, no code blocks):
         
     except Exception as e:
         print(f"  ✗ Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logging.exception("Reconciliation failed")
         return None
 
 
+def missing_abc_headers(abc_notation):
+    """Return the required ABC headers that do not start any line"""
+    found = {m.group(1) for m in _ABC_HEADERS_RE.finditer(abc_notation)}
+    return [f"{h}:" for h in REQUIRED_ABC_HEADERS if h not in found]
+
+
+def validate_abc(abc_notation):
+    """Validate ABC notation has required headers"""
+    return not missing_abc_headers(abc_notation)
+
+
 def main():
     print("="*80)
     print("🎵 SCONCES POC: Tab Reconciliation (Mock Test)")
@@ -230,15 +267,13 @@ def main():
     print("-"*80)
     
     # Validate
-    required = ['X:', 'T:', 'M:', 'L:', 'K:']
-    is_valid = all(h in abc for h in required)
+    is_valid = validate_abc(abc)
     
     if is_valid:
         print("\n✅ ABC notation is VALID!")
     else:
         print("\n⚠️  Missing required headers")
-        missing = [h for h in required if h not in abc]
-        print(f"Missing: {missing}")
+        print(f"Missing: {missing_abc_headers(abc)}")
     
     # Summary
     print("\n" + "="*80)
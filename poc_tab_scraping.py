@@ -4,23 +4,120 @@ POC: Tab Scraping for Sconces
 Tests ability to search and extract guitar tabs from the web
 """
 
-import requests
+import asyncio
+import aiohttp
+import contextlib
 from bs4 import BeautifulSoup
+import html as html_module
 import json
+import logging
 import os
-from typing import List, Dict
+import re
+import shelve
+import subprocess
+import sys
+import time
+from typing import List, Dict, Union
+from urllib.parse import unquote
+
+try:
+    import orjson as _json
+except ImportError:
+    _json = json
+
+# selectolax (lexbor) parses tab pages in C, far faster than BeautifulSoup;
+# BeautifulSoup (lxml if present) is only used for pages if it is missing
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+    try:
+        import lxml  # noqa: F401
+        HTML_PARSER = 'lxml'
+    except ImportError:
+        HTML_PARSER = 'html.parser'
+
+# httpx with h2 fetches tab pages over HTTP/2, so concurrent requests to one
+# host share a single multiplexed connection; aiohttp (HTTP/1.1) is the fallback
+try:
+    import h2  # noqa: F401
+    import httpx
+except ImportError:
+    httpx = None
+
+# Per-request progress goes through logging; POC_LOG=DEBUG shows every step
+log = logging.getLogger(__name__)
 
 # You'll need to get a Brave Search API key from: https://brave.com/search/api/
 BRAVE_API_KEY = os.getenv('BRAVE_API_KEY', 'YOUR_API_KEY_HERE')
 
-def search_tabs_brave(song_name: str, num_results: int = 5) -> List[Dict]:
+_JS_STORE_MARKER = '<div class="js-store" data-content="'
+_JS_STORE_MARKER_BYTES = _JS_STORE_MARKER.encode()
+_UG_ENTITIES = {'&quot;': '"', '&amp;': '&', '&#039;': "'", '&lt;': '<', '&gt;': '>'}
+_UG_ENTITY_RE = re.compile('|'.join(map(re.escape, _UG_ENTITIES)))
+# DuckDuckGo wraps result links as /l/?uddg=<quoted url>&...
+_UDDG_RE = re.compile(r'uddg=([^&]+)')
+_KEY_RE = re.compile(r'Key:\s*([A-G][#b]?[m]?)', re.IGNORECASE)
+_BRACKET_CHORD_RE = re.compile(r'\[([A-G][#b]?[m]?[0-9]*)\]')
+# Bracketed chords ([C], [Am], [G7]) or bare chords followed by whitespace, in one scan
+_CHORDS_RE = re.compile(r'\[([A-G][#b]?[m]?[0-9]*)\]|\b([A-G][#b]?[m]?[0-9]?)\s+')
+
+FETCH_TIMEOUT = aiohttp.ClientTimeout(total=15)
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9'
+}
+SEARCH_TIMEOUT = aiohttp.ClientTimeout(total=10)
+READ_CHUNK = 65536
+
+# Text markers that identify tab content in the HTML fallbacks
+_TAB_PRE_MARKERS = ('Verse', 'Chorus', '[Intro]', '[Verse]', '[Chorus]', 'Capo')
+_TAB_DIV_MARKERS = ('Chord', '[Verse]', '[Chorus]', 'Intro:')
+# Only divs laid out with line breaks or preformatted text can hold a tab
+_TAB_DIV_SELECTOR = 'div:has(> br, > pre)'
+
+# Search results and fetched pages are kept on disk so re-runs skip the network
+CACHE_PATH = os.getenv('POC_CACHE', '.scrapecache')
+SEARCH_CACHE_TTL = 24 * 3600  # seconds
+PAGE_CACHE_TTL = 3600
+
+
+def _cache_get(key: str, ttl: float):
+    """Return the cached value for key, or None if missing or older than ttl"""
+    try:
+        with shelve.open(CACHE_PATH) as db:
+            entry = db.get(key)
+    except Exception as e:
+        log.warning("  ✗ Cache read failed: %s", e)
+        return None
+    if entry and time.time() - entry[0] < ttl:
+        return entry[1]
+    return None
+
+
+def _cache_set(key: str, value):
+    try:
+        with shelve.open(CACHE_PATH) as db:
+            db[key] = (time.time(), value)
+    except Exception as e:
+        log.warning("  ✗ Cache write failed: %s", e)
+
+
+async def search_tabs_brave(session: aiohttp.ClientSession, song_name: str, num_results: int = 5) -> List[Dict]:
     """Search for guitar tabs using Brave Search API"""
     
     if BRAVE_API_KEY == 'YOUR_API_KEY_HERE':
         print("⚠️  Warning: BRAVE_API_KEY not set. Using mock results.")
-        return search_tabs_fallback(song_name, num_results)
+        return await search_tabs_fallback(session, song_name, num_results)
     
-    print(f"\n🔍 Searching Brave for: '{song_name} guitar tab'")
+    cache_key = f"brave:{song_name}:{num_results}"
+    cached = _cache_get(cache_key, SEARCH_CACHE_TTL)
+    if cached is not None:
+        log.info("\n🔍 Using cached Brave results for: '%s'", song_name)
+        return cached
+    
+    log.info("\n🔍 Searching Brave for: '%s guitar tab'", song_name)
     
     url = "https://api.search.brave.com/res/v1/web/search"
     headers = {
@@ -34,41 +131,51 @@ def search_tabs_brave(song_name: str, num_results: int = 5) -> List[Dict]:
         f"{song_name} ultimate guitar"
     ]
     
-    results = []
-    
-    for query in queries[:1]:  # Just do first query for POC
+    async def fetch_query(query: str) -> List[Dict]:
         params = {
             "q": query,
             "count": num_results
         }
         
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                if 'web' in data and 'results' in data['web']:
-                    for result in data['web']['results']:
-                        results.append({
-                            'title': result.get('title', ''),
-                            'url': result.get('url', ''),
-                            'description': result.get('description', '')
-                        })
-                        print(f"  ✓ Found: {result.get('title', 'Untitled')}")
-            else:
-                print(f"  ✗ Brave API returned status {response.status_code}")
-                
+            async with session.get(url, headers=headers, params=params, timeout=SEARCH_TIMEOUT) as response:
+                if response.status != 200:
+                    log.warning("  ✗ Brave API returned status %s", response.status)
+                    return []
+                data = _json.loads(await response.read())
         except Exception as e:
-            print(f"  ✗ Error searching: {e}")
+            log.warning("  ✗ Error searching: %s", e)
+            return []
+        
+        found = []
+        if 'web' in data and 'results' in data['web']:
+            for result in data['web']['results']:
+                found.append({
+                    'title': result.get('title', ''),
+                    'url': result.get('url', ''),
+                    'description': result.get('description', '')
+                })
+                log.debug("  ✓ Found: %s", result.get('title', 'Untitled'))
+        return found
+    
+    # Just do first query for POC (Brave's free tier allows one query per second)
+    results = (await fetch_query(queries[0]))[:num_results]
     
-    return results[:num_results]
+    if results:
+        _cache_set(cache_key, results)
+    return results
 
 
-def search_tabs_fallback(song_name: str, num_results: int = 5) -> List[Dict]:
+async def search_tabs_fallback(session: aiohttp.ClientSession, song_name: str, num_results: int = 5) -> List[Dict]:
     """Fallback: Use regular Google/DuckDuckGo search (for testing without API key)"""
     
-    print(f"\n🔍 Searching DuckDuckGo for: '{song_name} guitar tab'")
+    cache_key = f"ddg:{song_name}:{num_results}"
+    cached = _cache_get(cache_key, SEARCH_CACHE_TTL)
+    if cached is not None:
+        log.info("\n🔍 Using cached DuckDuckGo results for: '%s'", song_name)
+        return cached
+    
+    log.info("\n🔍 Searching DuckDuckGo for: '%s guitar tab'", song_name)
     
     # DuckDuckGo HTML search (no API key needed)
     url = "https://html.duckduckgo.com/html/"
@@ -81,10 +188,12 @@ def search_tabs_fallback(song_name: str, num_results: int = 5) -> List[Dict]:
     }
     
     try:
-        response = requests.post(url, data=data, headers=headers, timeout=10)
+        async with session.post(url, data=data, headers=headers, timeout=SEARCH_TIMEOUT) as response:
+            status = response.status
+            page = await response.text()
         
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
+        if status == 200:
+            soup = BeautifulSoup(page, 'html.parser')
             results = []
             
             for result in soup.find_all('a', class_='result__a', limit=num_results):
@@ -92,24 +201,22 @@ def search_tabs_fallback(song_name: str, num_results: int = 5) -> List[Dict]:
                 href = result.get('href', '')
                 
                 # DuckDuckGo wraps URLs, extract the actual URL
-                if 'uddg=' in href:
-                    actual_url = href.split('uddg=')[1].split('&')[0]
-                    from urllib.parse import unquote
-                    actual_url = unquote(actual_url)
-                else:
-                    actual_url = href
+                uddg = _UDDG_RE.search(href)
+                actual_url = unquote(uddg.group(1)) if uddg else href
                 
                 results.append({
                     'title': title,
                     'url': actual_url,
                     'description': ''
                 })
-                print(f"  ✓ Found: {title}")
+                log.debug("  ✓ Found: %s", title)
             
+            if results:
+                _cache_set(cache_key, results)
             return results
             
     except Exception as e:
-        print(f"  ✗ Error searching: {e}")
+        log.warning("  ✗ Error searching: %s", e)
     
     # If all else fails, return hardcoded test URLs
     print("\n⚠️  Using hardcoded test URLs for Baby Shark")
@@ -122,26 +229,38 @@ def search_tabs_fallback(song_name: str, num_results: int = 5) -> List[Dict]:
     ]
 
 
-def extract_ultimate_guitar_json(html_content: str) -> str:
+def _ug_unescape(encoded: str) -> str:
+    """Decode the handful of entities UG uses in data-content in one pass"""
+    return _UG_ENTITY_RE.sub(lambda m: _UG_ENTITIES[m.group(0)], encoded)
+
+
+def extract_ultimate_guitar_json(html_content: Union[str, bytes]) -> str:
     """Extract tab content from Ultimate Guitar's JSON data store"""
-    import re
-    import json
-    import html as html_module
+    # Raw page bytes are searched as-is so only the data-content slice gets decoded
+    is_bytes = isinstance(html_content, bytes)
+    marker = _JS_STORE_MARKER_BYTES if is_bytes else _JS_STORE_MARKER
     
     # Find the js-store div with data-content
-    pattern = r'<div class="js-store" data-content="([^"]+)"'
-    match = re.search(pattern, html_content)
-    
-    if not match:
+    start = html_content.find(marker)
+    if start < 0:
+        return None
+    start += len(marker)
+    end = html_content.find(b'"' if is_bytes else '"', start)
+    if end <= start:
         return None
     
     # Get HTML-encoded JSON and decode it
-    encoded_json = match.group(1)
-    decoded_json = html_module.unescape(encoded_json)
+    encoded_json = html_content[start:end]
+    if is_bytes:
+        encoded_json = encoded_json.decode('utf-8', errors='replace')
     
     try:
         # Parse JSON
-        data = json.loads(decoded_json)
+        try:
+            data = _json.loads(_ug_unescape(encoded_json))
+        except ValueError:
+            # Unexpected entities: fall back to the full HTML unescape
+            data = _json.loads(html_module.unescape(encoded_json))
         
         # Navigate to tab content
         if 'store' in data and 'page' in data['store']:
@@ -153,8 +272,8 @@ def extract_ultimate_guitar_json(html_content: str) -> str:
                 if 'wiki_tab' in tab_view and 'content' in tab_view['wiki_tab']:
                     return tab_view['wiki_tab']['content']
                 
-    except json.JSONDecodeError as e:
-        print(f"  ✗ JSON decode error: {e}")
+    except ValueError as e:
+        log.warning("  ✗ JSON decode error: %s", e)
         return None
     
     return None
@@ -162,18 +281,10 @@ def extract_ultimate_guitar_json(html_content: str) -> str:
 
 def fetch_with_curl(url: str) -> str:
     """Fetch URL using system curl command (bypasses anti-bot detection)"""
-    import subprocess
-    
-    curl_command = [
-        'curl',
-        '-s',  # Silent mode
-        '-L',  # Follow redirects
-        '-H', 'User-Agent: Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        '-H', 'Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-        '-H', 'Accept-Language: en-US,en;q=0.9',
-        '--compressed',  # Handle gzip/deflate
-        url
-    ]
+    curl_command = ['curl', '-s', '-L', '--compressed']  # silent, follow redirects, gzip/deflate
+    for name, value in BROWSER_HEADERS.items():
+        curl_command += ['-H', f'{name}: {value}']
+    curl_command.append(url)
     
     try:
         result = subprocess.run(
@@ -186,81 +297,211 @@ def fetch_with_curl(url: str) -> str:
         if result.returncode == 0:
             return result.stdout
         else:
-            print(f"  ✗ curl failed with code {result.returncode}")
+            log.warning("  ✗ curl failed with code %s", result.returncode)
             if result.stderr:
-                print(f"  Error: {result.stderr[:200]}")
+                log.warning("  Error: %s", result.stderr[:200])
             return None
             
     except subprocess.TimeoutExpired:
-        print(f"  ✗ curl timeout after 15 seconds")
+        log.warning("  ✗ curl timeout after 15 seconds")
+        return None
+    except Exception as e:
+        log.warning("  ✗ curl error: %s", e)
         return None
+
+
+def _parse_html(html_content: str):
+    if LexborHTMLParser is not None:
+        return LexborHTMLParser(html_content)
+    return BeautifulSoup(html_content, HTML_PARSER)
+
+
+def _css_first(tree, selector: str):
+    if LexborHTMLParser is not None:
+        return tree.css_first(selector)
+    return tree.select_one(selector)
+
+
+def _css(tree, selector: str):
+    if LexborHTMLParser is not None:
+        return tree.css(selector)
+    return tree.select(selector)
+
+
+def _node_text(node) -> str:
+    if LexborHTMLParser is not None:
+        return node.text()
+    return node.get_text()
+
+
+async def _read_until_js_store(chunks) -> bytes:
+    """Read a UG page's body chunks only until its js-store data-content attribute closes"""
+    marker = _JS_STORE_MARKER_BYTES
+    buffer = bytearray()
+    scanned = 0
+    found_marker = False
+    
+    async for chunk in chunks:
+        buffer += chunk
+        if not found_marker:
+            idx = buffer.find(marker, max(0, scanned - len(marker) + 1))
+            if idx < 0:
+                scanned = len(buffer)
+                continue
+            found_marker = True
+            scanned = idx + len(marker)
+        if buffer.find(b'"', scanned) >= 0:
+            break
+        scanned = len(buffer)
+    
+    # Left undecoded: extract_ultimate_guitar_json only needs the data-content slice
+    return bytes(buffer)
+
+
+async def fetch_page(session, url: str) -> Union[str, bytes]:
+    """Fetch a page, served from the disk cache when it was fetched recently"""
+    cache_key = f"page:{url}"
+    cached = _cache_get(cache_key, PAGE_CACHE_TTL)
+    if cached is not None:
+        log.debug("  ✓ Using cached page")
+        return cached
+    
+    html_content = await _download_page(session, url)
+    if html_content:
+        _cache_set(cache_key, html_content)
+    return html_content
+
+
+async def _download_page(session, url: str) -> Union[str, bytes]:
+    """Fetch a page on the shared session, retrying with curl if we are blocked"""
+    if httpx is not None and isinstance(session, httpx.AsyncClient):
+        return await _download_page_http2(session, url)
+    try:
+        async with session.get(url, allow_redirects=True) as response:
+            if response.status == 403:
+                # fallback: some sites only let curl's TLS fingerprint through
+                log.info("  ✗ Blocked (403), retrying with system curl...")
+                return await asyncio.to_thread(fetch_with_curl, url)
+            if 'ultimate-guitar.com' in url:
+                return await _read_until_js_store(response.content.iter_chunked(READ_CHUNK))
+            return await response.text(errors='replace')
     except Exception as e:
-        print(f"  ✗ curl error: {e}")
+        log.warning("  ✗ Fetch error: %s", e)
         return None
 
 
-def extract_tab_content(url: str) -> Dict:
+async def _download_page_http2(client, url: str) -> Union[str, bytes]:
+    """_download_page for an httpx HTTP/2 client"""
+    async def fetch():
+        async with client.stream('GET', url) as response:
+            if response.status_code == 403:
+                return None, True
+            if 'ultimate-guitar.com' in url:
+                return await _read_until_js_store(response.aiter_bytes(READ_CHUNK)), False
+            await response.aread()
+            return response.text, False
+    
+    try:
+        # httpx timeouts apply per connect/read/write phase, so a page that keeps
+        # trickling in never trips them; wait_for caps the whole request like
+        # aiohttp's ClientTimeout.total
+        html_content, blocked = await asyncio.wait_for(fetch(), FETCH_TIMEOUT.total)
+    except asyncio.TimeoutError:
+        log.warning("  ✗ Fetch timed out after %s seconds", FETCH_TIMEOUT.total)
+        return None
+    except Exception as e:
+        log.warning("  ✗ Fetch error: %s", e)
+        return None
+    
+    if blocked:
+        log.info("  ✗ Blocked (403), retrying with system curl...")
+        return await asyncio.to_thread(fetch_with_curl, url)
+    return html_content
+
+
+def _page_client(session: aiohttp.ClientSession):
+    """An HTTP/2 client for tab pages when httpx is installed, else the aiohttp session"""
+    if httpx is None:
+        return contextlib.nullcontext(session)
+    return httpx.AsyncClient(
+        http2=True,
+        headers=BROWSER_HEADERS,
+        # Per-phase limit only; _download_page_http2 enforces the overall one
+        timeout=FETCH_TIMEOUT.total,
+        follow_redirects=True
+    )
+
+
+def _extract_ultimate_guitar(html_content: Union[str, bytes]) -> str:
+    """UG renders tabs with JS, so the JSON data store is the only place to look"""
+    content = extract_ultimate_guitar_json(html_content)
+    if content:
+        log.debug("  ✓ Extracted from Ultimate Guitar JSON data store")
+    return content
+
+
+def _extract_generic_html(html_content: str) -> str:
+    """Look for tab-like text in the page markup"""
+    tree = _parse_html(html_content)
+    
+    # Try different tab content selectors
+    for selector in ('pre.js-tab-content', 'pre.Htbd7', 'code'):
+        element = _css_first(tree, selector)
+        if element is not None:
+            text = _node_text(element)
+            log.debug("  ✓ Found content in <%s>", selector)
+            if text:
+                return text
+            break
+    
+    # Look for any pre tags with tab-like content
+    for pre in _css(tree, 'pre'):
+        text = _node_text(pre)
+        if any(marker in text for marker in _TAB_PRE_MARKERS):
+            log.debug("  ✓ Found tab in pre tag")
+            return text
+    
+    # Look for chord/lyric patterns in divs
+    for div in _css(tree, _TAB_DIV_SELECTOR):
+        text = _node_text(div)
+        if len(text) > 100 and any(marker in text for marker in _TAB_DIV_MARKERS):
+            log.debug("  ✓ Found tab in div")
+            return text
+    
+    return None
+
+
+# Site-specific extractors, matched on the URL; when one matches its result is
+# final, and only unknown sites go through the generic HTML search
+_EXTRACTORS = (
+    ('ultimate-guitar.com', _extract_ultimate_guitar),
+)
+
+
+def _extractor_for(url: str):
+    for domain, extractor in _EXTRACTORS:
+        if domain in url:
+            return extractor
+    return _extract_generic_html
+
+
+async def extract_tab_content(session, url: str) -> Dict:
     """Extract tab content from a URL"""
     
-    print(f"\n📄 Fetching content from: {url}")
+    log.info("\n📄 Fetching content from: %s", url)
     
-    # Use curl instead of requests to bypass anti-bot detection
-    print(f"  Using system curl command...")
-    html_content = fetch_with_curl(url)
+    html_content = await fetch_page(session, url)
     
     if not html_content:
         return {'error': 'Failed to fetch content'}
     
-    print(f"  ✓ Fetched {len(html_content)} bytes")
-    
-    content = None
+    log.debug("  ✓ Fetched %d bytes", len(html_content))
     
-    # Try Ultimate Guitar JSON extraction first
-    if 'ultimate-guitar.com' in url:
-        content = extract_ultimate_guitar_json(html_content)
-        if content:
-            print(f"  ✓ Extracted from Ultimate Guitar JSON data store")
-    
-    # Fallback to BeautifulSoup extraction for other sites
-    if not content:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Try different tab content selectors
-        selectors = [
-            ('pre', {'class': 'js-tab-content'}),
-            ('pre', {'class': 'Htbd7'}),
-            ('code', {}),
-        ]
-        
-        for tag, attrs in selectors:
-            element = soup.find(tag, attrs)
-            if element:
-                content = element.get_text()
-                print(f"  ✓ Found content in <{tag}> with {attrs}")
-                break
-        
-        # Look for any pre tags with tab-like content
-        if not content:
-            for pre in soup.find_all('pre'):
-                text = pre.get_text()
-                if any(marker in text for marker in ['Verse', 'Chorus', '[Intro]', '[Verse]', '[Chorus]', 'Capo']):
-                    content = text
-                    print(f"  ✓ Found tab in pre tag")
-                    break
-        
-        # Look for chord/lyric patterns in divs
-        if not content:
-            for div in soup.find_all('div'):
-                text = div.get_text()
-                if len(text) > 100 and any(marker in text for marker in ['Chord', '[Verse]', '[Chorus]', 'Intro:']):
-                    content = text
-                    print(f"  ✓ Found tab in div")
-                    break
+    content = _extractor_for(url)(html_content)
     
     if content:
-        # Extract first 30 lines for preview
-        lines = content.strip().split('\n')
-        preview = '\n'.join(lines[:30])
+        # Split once; the preview is kept as lines so print_results needn't re-split
+        lines = content.strip().splitlines()
         
         # Try to identify key
         key = extract_key(content)
@@ -270,27 +511,25 @@ def extract_tab_content(url: str) -> Dict:
         
         return {
             'content': content,
-            'preview': preview,
+            'preview_lines': lines[:30],
             'line_count': len(lines),
             'detected_key': key,
             'detected_chords': chords[:10] if chords else []
         }
     else:
-        print(f"  ✗ Could not extract tab content")
+        log.warning("  ✗ Could not extract tab content")
         return {'error': 'Could not extract content'}
 
 
 def extract_key(content: str) -> str:
     """Try to detect the key from tab content"""
-    import re
-    
     # Look for "Key: X" or "Capo: X"
-    key_match = re.search(r'Key:\s*([A-G][#b]?[m]?)', content, re.IGNORECASE)
+    key_match = _KEY_RE.search(content)
     if key_match:
         return key_match.group(1)
     
     # Look for first chord
-    chord_match = re.search(r'\[([A-G][#b]?[m]?[0-9]*)\]', content)
+    chord_match = _BRACKET_CHORD_RE.search(content)
     if chord_match:
         return chord_match.group(1)
     
@@ -299,54 +538,75 @@ def extract_key(content: str) -> str:
 
 def extract_chords(content: str) -> List[str]:
     """Extract unique chords from content"""
-    import re
-    
-    # Match chord patterns: [C], [Am], [G7], etc.
-    chords = re.findall(r'\[([A-G][#b]?[m]?[0-9]*)\]', content)
-    
-    # Also try bare chords (common in tabs)
-    bare_chords = re.findall(r'\b([A-G][#b]?[m]?[0-9]?)\s+', content)
-    
-    all_chords = chords + bare_chords
+    # Single pass over the content; each match fills exactly one of the two groups
+    matches = (bracket or bare for bracket, bare in _CHORDS_RE.findall(content))
     
     # Remove duplicates, preserve order
-    seen = set()
-    unique_chords = []
-    for chord in all_chords:
-        if chord not in seen and len(chord) <= 5:  # Filter out long strings
-            seen.add(chord)
-            unique_chords.append(chord)
+    unique_chords = [c for c in dict.fromkeys(matches) if len(c) <= 5]  # Filter out long strings
     
     return unique_chords
 
 
 def print_results(results: List[Dict]):
     """Pretty print the tab extraction results"""
-    print("\n" + "="*80)
-    print("📊 TAB SCRAPING POC RESULTS")
-    print("="*80)
+    # Collect every line first and write them out in one call
+    out = ["\n" + "="*80, "📊 TAB SCRAPING POC RESULTS", "="*80]
     
     for i, result in enumerate(results, 1):
-        print(f"\n--- Result #{i} ---")
-        print(f"Title: {result.get('title', 'N/A')}")
-        print(f"URL: {result.get('url', 'N/A')}")
+        out.append(f"\n--- Result #{i} ---")
+        out.append(f"Title: {result.get('title', 'N/A')}")
+        out.append(f"URL: {result.get('url', 'N/A')}")
         
         if 'error' in result:
-            print(f"❌ Error: {result['error']}")
+            out.append(f"❌ Error: {result['error']}")
         else:
-            print(f"✅ Successfully extracted tab")
-            print(f"   Lines: {result.get('line_count', 0)}")
-            print(f"   Detected Key: {result.get('detected_key', 'Unknown')}")
-            print(f"   Detected Chords: {', '.join(result.get('detected_chords', []))}")
-            print(f"\n   Preview (first 30 lines):")
-            print("   " + "-"*70)
-            preview = result.get('preview', '')
-            for line in preview.split('\n')[:20]:  # Show first 20 lines
-                print(f"   {line}")
-            print("   " + "-"*70)
+            out.append(f"✅ Successfully extracted tab")
+            out.append(f"   Lines: {result.get('line_count', 0)}")
+            out.append(f"   Detected Key: {result.get('detected_key', 'Unknown')}")
+            out.append(f"   Detected Chords: {', '.join(result.get('detected_chords', []))}")
+            out.append(f"\n   Preview (first 30 lines):")
+            out.append("   " + "-"*70)
+            out.extend(f"   {line}" for line in result.get('preview_lines', [])[:20])  # Show first 20 lines
+            out.append("   " + "-"*70)
+    
+    out.append('')
+    sys.stdout.write('\n'.join(out))
+    sys.stdout.flush()
+
+
+async def run_poc(song_name: str) -> List[Dict]:
+    """Search for tabs and extract the top results, sharing one HTTP session"""
+    
+    connector = aiohttp.TCPConnector(limit=20, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector, headers=BROWSER_HEADERS, timeout=FETCH_TIMEOUT) as session:
+        # Step 1: Search for tabs
+        search_results = await search_tabs_brave(session, song_name, num_results=3)
+        
+        if not search_results:
+            print("\n❌ No search results found")
+            return None
+        
+        print(f"\n✓ Found {len(search_results)} potential tab sources")
+        
+        # Step 2: Try to extract content from each result concurrently
+        candidates = search_results[:2]  # Test first 2 results
+        print(f"\n--- Testing {len(candidates)} sources concurrently ---")
+        
+        async with _page_client(session) as page_client:
+            tab_results = await asyncio.gather(
+                *(extract_tab_content(page_client, result['url']) for result in candidates)
+            )
+    
+    for tab_data, result in zip(tab_results, candidates):
+        tab_data['title'] = result['title']
+        tab_data['url'] = result['url']
+    
+    return tab_results
 
 
 def main():
+    logging.basicConfig(level=os.getenv('POC_LOG', 'INFO').upper(), format='%(message)s')
+    
     print("🎵 Sconces Tab Scraping POC")
     print("="*80)
     
@@ -357,26 +617,11 @@ def main():
     
     print(f"\nTesting with: '{song_name}'")
     
-    # Step 1: Search for tabs
-    search_results = search_tabs_brave(song_name, num_results=3)
+    tab_results = asyncio.run(run_poc(song_name))
     
-    if not search_results:
-        print("\n❌ No search results found")
+    if tab_results is None:
         return
     
-    print(f"\n✓ Found {len(search_results)} potential tab sources")
-    
-    # Step 2: Try to extract content from each result
-    tab_results = []
-    for i, result in enumerate(search_results[:2], 1):  # Test first 2 results
-        print(f"\n--- Testing source {i}/{len(search_results[:2])} ---")
-        
-        tab_data = extract_tab_content(result['url'])
-        tab_data['title'] = result['title']
-        tab_data['url'] = result['url']
-        
-        tab_results.append(tab_data)
-    
     # Step 3: Print summary
     print_results(tab_results)
     
@@ -3,9 +3,65 @@
 Test script for music generation endpoint
 """
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import sys
 
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+# One pooled session for every request; the worker threads share it
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=10, pool_maxsize=10))
+
+def run_case(base_url, test_case):
+    """POST one test case to the generation endpoint"""
+    return SESSION.post(
+        f"{base_url}/api/v1/music/generate",
+        json=test_case,
+        timeout=30
+    )
+
+def print_case_result(i, test_case, future):
+    """Print the outcome of one generation request once it has completed"""
+    print(f"\n   Test {i}: {test_case['description'][:50]}...")
+    
+    try:
+        response = future.result()
+        
+        if response.status_code == 200:
+            result = _json.loads(response.content)
+            print(f"   ✅ Success!")
+            print(f"      Music ID: {result.get('music_id', 'N/A')}")
+            print(f"      Title: {result.get('title', 'N/A')}")
+            print(f"      Confidence: {result.get('confidence', 'N/A')}")
+            print(f"      Validation: {result.get('validation_status', 'N/A')}")
+            print(f"      ABC Preview: {result.get('abc_notation', '')[:100]}...")
+            
+            # Show ABC notation
+            abc_lines = result.get('abc_notation', '').split('\n')
+            print("      ABC Notation:")
+            for line in abc_lines[:5]:  # Show first 5 lines
+                if line.strip():
+                    print(f"        {line}")
+            if len(abc_lines) > 5:
+                print("        ...")
+            
+        else:
+            print(f"   ❌ Failed with status {response.status_code}")
+            try:
+                error = _json.loads(response.content)
+                print(f"      Error: {error.get('detail', 'Unknown error')}")
+            except:
+                print(f"      Error: {response.text}")
+            
+    except requests.exceptions.Timeout:
+        print("   ⏰ Request timed out (30s)")
+    except Exception as e:
+        print(f"   ❌ Error: {e}")
+
 def test_music_generation():
     """Test the music generation endpoint"""
     
@@ -33,10 +89,10 @@ def test_music_generation():
     # Test 1: Check if service is running
     print("\n1. Testing service health...")
     try:
-        response = requests.get(f"{base_url}/", timeout=5)
+        response = SESSION.get(f"{base_url}/", timeout=5)
         if response.status_code == 200:
             print("✅ Service is running")
-            print(f"   Features: {response.json().get('features', [])}")
+            print(f"   Features: {_json.loads(response.content).get('features', [])}")
         else:
             print(f"❌ Service returned status {response.status_code}")
             return False
@@ -51,53 +107,22 @@ def test_music_generation():
     # Test 2: Test generation endpoint
     print("\n2. Testing music generation...")
     
-    for i, test_case in enumerate(test_cases, 1):
-        print(f"\n   Test {i}: {test_case['description'][:50]}...")
-        
-        try:
-            response = requests.post(
-                f"{base_url}/api/v1/music/generate",
-                json=test_case,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                print(f"   ✅ Success!")
-                print(f"      Music ID: {result.get('music_id', 'N/A')}")
-                print(f"      Title: {result.get('title', 'N/A')}")
-                print(f"      Confidence: {result.get('confidence', 'N/A')}")
-                print(f"      Validation: {result.get('validation_status', 'N/A')}")
-                print(f"      ABC Preview: {result.get('abc_notation', '')[:100]}...")
-                
-                # Show ABC notation
-                abc_lines = result.get('abc_notation', '').split('\n')
-                print("      ABC Notation:")
-                for line in abc_lines[:5]:  # Show first 5 lines
-                    if line.strip():
-                        print(f"        {line}")
-                if len(abc_lines) > 5:
-                    print("        ...")
-                    
-            else:
-                print(f"   ❌ Failed with status {response.status_code}")
-                try:
-                    error = response.json()
-                    print(f"      Error: {error.get('detail', 'Unknown error')}")
-                except:
-                    print(f"      Error: {response.text}")
-                    
-        except requests.exceptions.Timeout:
-            print("   ⏰ Request timed out (30s)")
-        except Exception as e:
-            print(f"   ❌ Error: {e}")
+    # Cases are independent, so send them all at once and report as they finish
+    with ThreadPoolExecutor(max_workers=len(test_cases)) as executor:
+        futures = {
+            executor.submit(run_case, base_url, test_case): (i, test_case)
+            for i, test_case in enumerate(test_cases, 1)
+        }
+        for future in as_completed(futures):
+            i, test_case = futures[future]
+            print_case_result(i, test_case, future)
     
     # Test 3: Test error handling
     print("\n3. Testing error handling...")
     
     try:
         # Test with invalid request
-        response = requests.post(
+        response = SESSION.post(
             f"{base_url}/api/v1/music/generate",
             json={"invalid": "request"},
             timeout=10